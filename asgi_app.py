@@ -0,0 +1,395 @@
+"""
+asgi_app.py - Вебхук-сервер ASGI для хостингов с асинхронными серверами
+
+В отличие от pythonanywhere_app.py (Flask + поток с циклом событий) здесь
+все работает в одном цикле событий сервера: приложение из main.create_bot_application
+обрабатывает обновления параллельно (Application.concurrent_updates),
+напоминания ставятся таймерами JobQueue, как при polling
+
+Запуск (нужен ASGI-сервер, например uvicorn):
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+или
+    python asgi_app.py
+
+Сравнение с режимом Flask на локальной заглушке Bot API:
+    python asgi_app.py --benchmark
+
+Процесс должен быть один: таймеры напоминаний живут в памяти процесса
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import config
+import async_database as adb
+import ingestion
+import reminders
+from sqlalchemy import text
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 1024 * 1024  # обновления Telegram намного меньше
+
+class WebhookServer:
+    """
+    ASGI-приложение: POST /<BOT_TOKEN> - вебхук, GET /health и GET /stats
+    с теми же ответами, что и в pythonanywhere_app.py
+    """
+
+    def __init__(self, concurrent_updates=None):
+        self.concurrent_updates = concurrent_updates or config.CONCURRENT_UPDATES
+        self.application = None
+        self.reminder_manager = None
+        self.ingestor = None
+        self._ingestor_task = None
+
+    # ========== ЗАПУСК И ОСТАНОВКА ==========
+
+    async def startup(self):
+        """Инициализирует бота, таймеры напоминаний и очередь обновлений"""
+        from main import create_bot_application
+
+        self.application = create_bot_application(concurrent_updates=self.concurrent_updates)
+        await self.application.initialize()
+        await self.application.start()
+
+        self.reminder_manager = await reminders.setup_reminder_job(self.application)
+
+        self.ingestor = ingestion.UpdateIngestor.for_application(
+            self.application, asyncio.get_running_loop()
+        )
+        self._ingestor_task = asyncio.create_task(self.ingestor.run())
+
+        webhook_url = os.getenv("WEBHOOK_URL")
+        if webhook_url:
+            await self.application.bot.set_webhook(f"{webhook_url}/{config.BOT_TOKEN}")
+            logger.info(f"✅ Вебхук установлен на {webhook_url}/{config.BOT_TOKEN}")
+
+        logger.info(f"✅ ASGI-сервер бота запущен (одновременно до {self.concurrent_updates} обновлений)")
+
+    async def shutdown(self):
+        """Останавливает обработку обновлений и бота"""
+        if self._ingestor_task:
+            self._ingestor_task.cancel()
+        if self.application:
+            await self.application.stop()
+            await self.application.shutdown()
+        logger.info("🛑 ASGI-сервер бота остановлен")
+
+    # ========== ASGI ==========
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method, path = scope["method"], scope["path"]
+        try:
+            if method == "POST" and path == f"/{config.BOT_TOKEN}":
+                body = await self._read_body(receive)
+                if body is None:
+                    status, payload, headers = 413, {'status': 'error', 'message': 'Body is too large'}, {}
+                else:
+                    status, payload, headers = await self.webhook(body)
+            elif method == "GET" and path == "/health":
+                status, payload, headers = await self.health()
+            elif method == "GET" and path == "/stats":
+                status, payload, headers = await self.stats()
+            else:
+                status, payload, headers = 404, {'status': 'error', 'message': 'Not found'}, {}
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки {method} {path}: {e}", exc_info=True)
+            status, payload, headers = 500, {'status': 'error', 'message': str(e)}, {}
+
+        await self._send_json(send, status, payload, headers)
+
+    async def _lifespan(self, receive, send):
+        """События запуска и остановки ASGI-сервера"""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                    await send({"type": "lifespan.startup.complete"})
+                except Exception as e:
+                    logger.error(f"❌ Ошибка запуска бота: {e}", exc_info=True)
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        """Читает тело запроса, None - если оно больше MAX_BODY_SIZE"""
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_SIZE:
+                return None
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    @staticmethod
+    async def _send_json(send, status, payload, headers):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        raw_headers = [(b"content-type", b"application/json; charset=utf-8"),
+                       (b"content-length", str(len(body)).encode())]
+        raw_headers += [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+        await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
+
+    # ========== ОБРАБОТЧИКИ ==========
+
+    async def webhook(self, body):
+        """Ставит обновление в очередь и сразу отвечает Telegram"""
+        if not self.ingestor:
+            return 503, {'status': 'error', 'message': 'Bot is starting'}, {}
+
+        update = Update.de_json(json.loads(body), self.application.bot)
+
+        # submit не обращается к базе: повторы через базу проверяются при обработке
+        result = self.ingestor.submit(update.update_id, update)
+
+        if result == ingestion.QUEUE_FULL:
+            logger.warning(f"⚠️ Очередь вебхука переполнена, обновление {update.update_id} отклонено")
+            return 429, {'status': 'error', 'message': 'Queue is full'}, {'Retry-After': '1'}
+        if result == ingestion.DUPLICATE:
+            logger.info(f"🔁 Повторная доставка обновления {update.update_id} пропущена")
+            return 200, {'status': 'duplicate'}, {}
+        return 200, {'status': 'success'}, {}
+
+    async def health(self):
+        """Проверка здоровья системы"""
+        try:
+            await adb.run(self._check_database)
+            last_scan = await adb.get_last_reminder_scan()
+        except Exception as e:
+            return 500, {'status': 'unhealthy', 'error': str(e), 'timestamp': time.time()}, {}
+
+        return 200, {
+            'status': 'healthy',
+            'bot': "running" if self.application and self.application.running else "not_running",
+            'reminders': "timers" if self.reminder_manager else "not_running",
+            'last_reminder_scan': {
+                'started_at': last_scan['started_at'].isoformat(),
+                'duration_ms': last_scan['duration_ms'],
+                'holder': last_scan['holder'],
+                'error': last_scan['error'],
+            } if last_scan else None,
+            'webhook_queue': self.ingestor.stats() if self.ingestor else None,
+            'database': 'connected',
+            'timestamp': time.time(),
+            'server_time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'timezone': 'Europe/Moscow'
+        }, {}
+
+    @staticmethod
+    def _check_database():
+        import database as db
+
+        session = db.Session()
+        try:
+            session.execute(text("SELECT 1"))
+        finally:
+            session.close()
+
+    async def stats(self):
+        """Получение статистики"""
+        return 200, {
+            'status': 'success',
+            **await adb.get_bot_stats(),
+            'timestamp': time.time()
+        }, {}
+
+app = WebhookServer()
+
+# ========== СРАВНЕНИЕ С РЕЖИМОМ FLASK ==========
+
+def start_fake_telegram_api(latency=0.02):
+    """
+    Локальная заглушка Bot API: отвечает на любой метод как Telegram,
+    sendMessage отвечает с задержкой latency (имитация сети)
+
+    Returns:
+        (server, base_url, sent), где sent - список chat_id отправленных сообщений
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs
+
+    sent = []
+
+    class FakeTelegramHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            method = self.path.rsplit("/", 1)[-1]
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if "json" in self.headers.get("Content-Type", ""):
+                params = json.loads(raw or b"{}")
+            else:
+                params = {key: values[0] for key, values in parse_qs(raw.decode()).items()}
+
+            if method == "getMe":
+                result = {"id": 1, "is_bot": True, "first_name": "Бот", "username": "deadline_test_bot",
+                          "can_join_groups": False, "can_read_all_group_messages": False,
+                          "supports_inline_queries": False}
+            elif method == "sendMessage":
+                time.sleep(latency)
+                chat_id = int(params.get("chat_id", 0))
+                sent.append(chat_id)
+                result = {"message_id": len(sent), "date": int(time.time()),
+                          "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")}
+            else:
+                result = True
+
+            body = json.dumps({"ok": True, "result": result}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegramHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/bot", sent
+
+def benchmark_webhook_modes(updates=200, latency=0.02, clients=8):
+    """
+    Сравнивает пропускную способность вебхука на одной машине:
+    Flask + поток с циклом событий (pythonanywhere_app) и ASGI (WebhookServer)
+
+    Каждое обновление - команда /help из отдельного чата, ответ уходит
+    в локальную заглушку Bot API с задержкой latency. Время считается
+    от первого запроса до последнего отправленного ответа.
+    Обработчики пишут в базу (пользователи, processed_updates), поэтому
+    база подменяется временной до конца процесса: поток бота из
+    pythonanywhere_app (планировщик, аренда) продолжает работать и после замеров
+    """
+    import tempfile
+    import database as db
+
+    directory = tempfile.mkdtemp()
+    db.engine.dispose()
+    db.engine = db.create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    db.Base.metadata.create_all(db.engine)
+    db.migrate(db.engine)
+    # configure меняет уже созданную фабрику сессий, ее используют все функции database.py
+    db.Session.configure(bind=db.engine)
+    db.user_id_cache.clear()
+    config.DATABASE_URL = str(db.engine.url)
+
+    _run_webhook_benchmark(updates, latency, clients)
+
+def _run_webhook_benchmark(updates, latency, clients):
+    """Сами замеры benchmark_webhook_modes (база уже временная)"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    server, base_url, sent = start_fake_telegram_api(latency)
+    config.TELEGRAM_API_URL = base_url
+    os.environ.pop("PYTHONANYWHERE_SITE", None)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    def make_update(update_id):
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id, "date": int(time.time()), "text": "/help",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 5}],
+                "chat": {"id": update_id, "type": "private"},
+                "from": {"id": update_id, "is_bot": False, "first_name": "Тест"},
+            }
+        }
+
+    def wait_for_replies(first_id, timeout=120):
+        deadline = time.monotonic() + timeout
+        while sum(1 for chat_id in sent if chat_id >= first_id) < updates and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    print("=" * 60)
+    print(f"Сравнение режимов вебхука: {updates} обновлений, Bot API +{latency * 1000:.0f} мс")
+    print("=" * 60)
+
+    results = {}
+
+    # Flask: запросы из clients потоков, как от нескольких воркеров
+    import pythonanywhere_app
+    client = pythonanywhere_app.app.test_client()
+    first_id = 1_000_000
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(lambda i: client.post(f"/{config.BOT_TOKEN}", json=make_update(first_id + i)),
+                      range(updates)))
+    accepted = time.perf_counter() - started
+    wait_for_replies(first_id)
+    results["Flask + поток цикла"] = (accepted, time.perf_counter() - started)
+
+    # ASGI: те же запросы конкурентно в одном цикле событий
+    async def run_asgi():
+        server_app = WebhookServer()
+        await server_app.startup()
+
+        async def post(update_id):
+            body = json.dumps(make_update(update_id)).encode()
+            responses = []
+
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            async def send(message):
+                responses.append(message)
+
+            scope = {"type": "http", "method": "POST", "path": f"/{config.BOT_TOKEN}"}
+            await server_app(scope, receive, send)
+            return responses[0]["status"]
+
+        first = 2_000_000
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(clients)
+
+        async def limited(update_id):
+            async with semaphore:
+                return await post(update_id)
+
+        await asyncio.gather(*(limited(first + i) for i in range(updates)))
+        accepted = time.perf_counter() - started
+        await asyncio.get_running_loop().run_in_executor(None, wait_for_replies, first)
+        total = time.perf_counter() - started
+        await server_app.shutdown()
+        return accepted, total
+
+    results[f"ASGI (concurrent_updates={config.CONCURRENT_UPDATES})"] = asyncio.run(run_asgi())
+
+    for name, (accepted, total) in results.items():
+        print(f"{name}:")
+        print(f"  Прием запросов: {accepted * 1000:.0f} мс")
+        print(f"  Все ответы отправлены: {total * 1000:.0f} мс ({updates / total:.0f} обновлений/сек)")
+
+    server.shutdown()
+    print("=" * 60)
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+    if "--benchmark" in sys.argv:
+        benchmark_webhook_modes()
+    else:
+        try:
+            import uvicorn
+        except ImportError:
+            sys.exit("❌ Для режима ASGI нужен uvicorn: pip install uvicorn")
+        uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
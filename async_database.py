@@ -0,0 +1,73 @@
+"""
+async_database.py - Асинхронный доступ к базе данных для обработчиков бота
+
+Функции database.py выполняются в отдельном ограниченном пуле потоков,
+поэтому медленный запрос не останавливает цикл событий и обработку
+сообщений из других чатов
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import database as db
+
+# SQLite пишет в один поток, поэтому большой пул не нужен:
+# несколько потоков позволяют читать, пока идет запись (режим WAL)
+DB_WORKERS = 4
+
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+
+async def run(func, *args, **kwargs):
+    """
+    Выполняет синхронную функцию работы с базой в пуле потоков базы
+
+    Пример:
+        await run(reminder.enqueue_personal_reminders)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+def _async(func):
+    """Делает асинхронную версию функции database.py"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return wrapper
+
+# ========== ПОЛЬЗОВАТЕЛИ ==========
+
+get_or_create_user = _async(db.get_or_create_user)
+set_user_group = _async(db.set_user_group)
+set_user_notifications = _async(db.set_user_notifications)
+get_user_by_telegram_id = _async(db.get_user_by_telegram_id)
+
+# ========== ЛИЧНЫЕ ДЕДЛАЙНЫ ==========
+
+add_personal_deadline = _async(db.add_personal_deadline)
+add_personal_deadlines_bulk = _async(db.add_personal_deadlines_bulk)
+get_personal_deadlines = _async(db.get_personal_deadlines)
+list_personal_deadline_headers = _async(db.list_personal_deadline_headers)
+count_personal_deadlines = _async(db.count_personal_deadlines)
+get_personal_deadline = _async(db.get_personal_deadline)
+mark_personal_deadline_completed = _async(db.mark_personal_deadline_completed)
+delete_personal_deadline = _async(db.delete_personal_deadline)
+
+# ========== ГРУППОВЫЕ ДЕДЛАЙНЫ ==========
+
+add_group_deadline = _async(db.add_group_deadline)
+add_group_deadlines_bulk = _async(db.add_group_deadlines_bulk)
+get_group_deadlines = _async(db.get_group_deadlines)
+get_group_deadline = _async(db.get_group_deadline)
+get_user_group_deadlines = _async(db.get_user_group_deadlines)
+list_group_deadline_headers = _async(db.list_group_deadline_headers)
+count_group_deadlines_by_category = _async(db.count_group_deadlines_by_category)
+subscribe_to_group_deadline = _async(db.subscribe_to_group_deadline)
+delete_group_deadline = _async(db.delete_group_deadline)
+
+# ========== ОБЩИЕ ФУНКЦИИ ==========
+
+get_all_upcoming_deadlines = _async(db.get_all_upcoming_deadlines)
+record_reminder_scan = _async(db.record_reminder_scan)
+get_last_reminder_scan = _async(db.get_last_reminder_scan)
+get_bot_stats = _async(db.get_bot_stats)
+claim_update = _async(db.claim_update)
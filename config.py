@@ -47,12 +47,37 @@ if PYTHONANYWHERE:
 else:
     DATABASE_URL = "sqlite:///deadlines.db"  # Локально
 
+# Адрес базы можно переопределить переменной окружения
+DATABASE_URL = os.getenv("DATABASE_URL", DATABASE_URL)
+
 # Часовой пояс
 TIMEZONE = "Europe/Moscow"
 
 # Режим запуска
 USE_WEBHOOKS = PYTHONANYWHERE or os.environ.get('USE_WEBHOOKS', 'false').lower() == 'true'
 
+# Адрес Bot API (можно заменить на локальный Bot API сервер или тестовую заглушку)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
+# Сколько обновлений обрабатывать одновременно в режиме ASGI (asgi_app.py)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "8"))
+
+# Кэш /stats: сколько секунд ответ считается свежим и сколько еще его можно
+# отдавать устаревшим, пока в фоне считается новый
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))
+STATS_STALE_TTL = float(os.getenv("STATS_STALE_TTL", "300"))
+
+# Очередь входящих обновлений вебхука: при переполнении Telegram получает 429
+# и повторяет доставку позже
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+
+# Запоминать принятые update_id в базе, чтобы повторы отбрасывал любой процесс
+# (без этого повторы отбрасываются только в пределах одного процесса)
+WEBHOOK_DEDUPE_PERSIST = os.getenv("WEBHOOK_DEDUPE_PERSIST", "true").lower() == "true"
+
+# Файл логов, который показывает /logs
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+
 print(f"✅ Конфигурация загружена: {'PythonAnywhere' if PYTHONANYWHERE else 'Локальный'} режим")
 print(f"   Webhooks: {'Включены' if USE_WEBHOOKS else 'Отключены'}")
 print(f"   База данных: {DATABASE_URL}")
\ No newline at end of file
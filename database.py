@@ -2,13 +2,24 @@
 database.py - База данных для бота дедлайнов с поддержкой групповых и личных задач
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import (
+    create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey,
+    Index, UniqueConstraint, text, bindparam, event, tuple_, func, literal, insert,
+    select, union_all, cast, case, true
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from typing import NamedTuple, Optional
 from utils.time_utils import TimeManager
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 import logging
+import threading
+import time
 import pytz
+import config
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -28,7 +39,7 @@ class User(Base):
     username = Column(String)
     first_name = Column(String)
     last_name = Column(String)
-    group_name = Column(String, nullable=True)  # Название группы
+    group_name = Column(String, nullable=True, index=True)  # Название группы
     is_admin = Column(Boolean, default=False)  # Администратор группы
     created_at = Column(DateTime, default=datetime.now)
     notify_week = Column(Boolean, default=True)
@@ -57,9 +68,17 @@ class Deadline(Base):
     reminded_week = Column(Boolean, default=False)
     reminded_day = Column(Boolean, default=False)
     
+    # Момент ближайшего напоминания в UTC (NULL - напоминаний больше не будет)
+    next_reminder_at = Column(DateTime, nullable=True, index=True)
+    
     # Связь с пользователем
     user = relationship("User", back_populates="deadlines")
     
+    __table_args__ = (
+        # Список дедлайнов пользователя: активные/выполненные по сроку
+        Index('ix_personal_deadlines_user_completed_deadline', 'user_id', 'is_completed', 'deadline'),
+    )
+    
     def __repr__(self):
         return f"Личный дедлайн: {self.subject} - {self.task}"
 
@@ -74,6 +93,15 @@ class Deadline(Base):
         from utils.time_utils import TimeManager
         deadline_moscow = self.deadline_moscow
         return deadline_moscow - TimeManager.now()
+    
+    def update_next_reminder(self, now_utc=None):
+        """Пересчитывает момент ближайшего напоминания"""
+        if self.is_completed:
+            self.next_reminder_at = None
+        else:
+            self.next_reminder_at = TimeManager.next_reminder_at(
+                self.deadline, self.reminded_week, self.reminded_day, now_utc
+            )
 
 class GroupDeadline(Base):
     """
@@ -95,9 +123,17 @@ class GroupDeadline(Base):
     reminded_week = Column(Boolean, default=False)
     reminded_day = Column(Boolean, default=False)
     
+    # Момент ближайшего напоминания в UTC (NULL - напоминаний больше не будет)
+    next_reminder_at = Column(DateTime, nullable=True, index=True)
+    
     # Связь с создателем
     creator = relationship("User", back_populates="group_deadlines")
     
+    __table_args__ = (
+        # Дедлайны группы по сроку
+        Index('ix_group_deadlines_group_deadline', 'group_name', 'deadline'),
+    )
+    
     def __repr__(self):
         return f"Групповой дедлайн: {self.subject} - {self.task}"
 
@@ -112,6 +148,12 @@ class GroupDeadline(Base):
         from utils.time_utils import TimeManager
         deadline_moscow = self.deadline_moscow
         return deadline_moscow - TimeManager.now()
+    
+    def update_next_reminder(self, now_utc=None):
+        """Пересчитывает момент ближайшего напоминания"""
+        self.next_reminder_at = TimeManager.next_reminder_at(
+            self.deadline, self.reminded_week, self.reminded_day, now_utc
+        )
 
 class UserGroupDeadline(Base):
     """
@@ -127,22 +169,531 @@ class UserGroupDeadline(Base):
     created_at = Column(DateTime, default=datetime.now)
     
     # Простой вариант без ForeignKeyConstraint
-    __table_args__ = ()
+    __table_args__ = (
+        # Подписки пользователя и проверка подписки на дедлайн
+        Index('ix_user_group_deadlines_user_deadline', 'user_id', 'group_deadline_id'),
+    )
     
     def __repr__(self):
         return f"Подписка пользователя {self.user_id} на дедлайн {self.group_deadline_id}"
 
+class ReminderOutbox(Base):
+    """
+    Очередь напоминаний к отправке
+    Строки записываются в одной транзакции с флагами напоминаний,
+    а отправитель отмечает каждую строку отдельно
+    """
+    __tablename__ = 'reminder_outbox'
+    
+    id = Column(Integer, primary_key=True)
+    deadline_type = Column(String, nullable=False)  # "personal" или "group"
+    deadline_id = Column(Integer, nullable=False)
+    chat_id = Column(Integer, nullable=False)  # Telegram ID получателя
+    reminder_type = Column(String, nullable=False)  # "week" или "day"
+    scheduled_at = Column(DateTime, nullable=False)  # Расчетный момент напоминания (UTC)
+    next_attempt_at = Column(DateTime, nullable=False)  # Когда пробовать отправить (UTC)
+    attempts = Column(Integer, default=0)
+    status = Column(String, default="pending")  # pending, sent, failed, cancelled
+    sent_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Одно напоминание одного вида одному получателю
+        UniqueConstraint('deadline_type', 'deadline_id', 'chat_id', 'reminder_type'),
+        Index('ix_reminder_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    def __repr__(self):
+        return f"Напоминание {self.reminder_type} о дедлайне {self.deadline_type} {self.deadline_id} для {self.chat_id}"
+
+class GroupReminderLedger(Base):
+    """
+    Журнал групповых напоминаний: кто и о чем уже получил напоминание
+    Одна строка на (дедлайн, вид напоминания, пользователь), без отдельного id
+    """
+    __tablename__ = 'group_reminder_ledger'
+    
+    # Порядок колонок ключа - для выборки получателей по дедлайну
+    group_deadline_id = Column(Integer, primary_key=True)
+    reminder_type = Column(String, primary_key=True)  # "week" или "day"
+    user_id = Column(Integer, primary_key=True)
+    
+    __table_args__ = {'sqlite_with_rowid': False}
+    
+    def __repr__(self):
+        return f"Напоминание {self.reminder_type} о групповом дедлайне {self.group_deadline_id} для пользователя {self.user_id}"
+
+class SchedulerLease(Base):
+    """
+    Аренда роли планировщика: проверку напоминаний делает только
+    держатель аренды, остальные процессы ждут, пока она истечет
+    """
+    __tablename__ = 'scheduler_lease'
+    
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)  # "хост:pid" процесса
+    expires_at = Column(DateTime, nullable=False)  # UTC
+    renewed_at = Column(DateTime, nullable=False)  # UTC
+    
+    def __repr__(self):
+        return f"Аренда {self.name} у {self.holder} до {self.expires_at}"
+
+class ReminderScan(Base):
+    """
+    Журнал проверок напоминаний с длительностью
+    """
+    __tablename__ = 'reminder_scans'
+    
+    id = Column(Integer, primary_key=True)
+    holder = Column(String, nullable=False)
+    started_at = Column(DateTime, nullable=False)  # UTC
+    duration_ms = Column(Integer, nullable=False)
+    error = Column(String, nullable=True)
+    
+    def __repr__(self):
+        return f"Проверка напоминаний {self.started_at} ({self.duration_ms} мс)"
+
+class ProcessedUpdate(Base):
+    """
+    Принятые обновления Telegram: повторная доставка того же update_id
+    (Telegram повторяет запрос, если вебхук ответил слишком поздно)
+    отбрасывается любым процессом веб-приложения
+    """
+    __tablename__ = 'processed_updates'
+    
+    update_id = Column(Integer, primary_key=True, autoincrement=False)
+    received_at = Column(DateTime, nullable=False)  # UTC
+    
+    def __repr__(self):
+        return f"Обновление {self.update_id} принято {self.received_at}"
+
+# ========== МОДЕЛИ ДЛЯ ЧТЕНИЯ ==========
+# Функции чтения возвращают неизменяемые кортежи, собранные прямо из строк запроса,
+# а не открепленные объекты ORM: без identity map, инструментации и __dict__
+
+# Сколько символов задания показывать в списках
+TASK_PREVIEW_LENGTH = 20
+
+class UserView(NamedTuple):
+    """Пользователь (только чтение)"""
+    id: int
+    telegram_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    group_name: Optional[str]
+    is_admin: bool
+    created_at: datetime
+    notify_week: bool
+    notify_day: bool
+
+class PersonalDeadlineView(NamedTuple):
+    """Личный дедлайн (только чтение), время в UTC"""
+    id: int
+    user_id: int
+    subject: str
+    task: str
+    deadline: datetime
+    priority: str
+    is_completed: bool
+    created_at: datetime
+    reminded_week: bool
+    reminded_day: bool
+    next_reminder_at: Optional[datetime]
+    
+    @property
+    def deadline_moscow(self):
+        """Получить время дедлайна в московском часовом поясе"""
+        return TimeManager.from_db_to_moscow(self.deadline)
+    
+    @property
+    def time_left(self):
+        """Оставшееся время до дедлайна"""
+        return self.deadline_moscow - TimeManager.now()
+    
+    @property
+    def task_preview(self):
+        """Начало описания задания для списков"""
+        return self.task[:TASK_PREVIEW_LENGTH]
+
+class GroupDeadlineView(NamedTuple):
+    """Групповой дедлайн (только чтение), время в UTC"""
+    id: int
+    creator_id: int
+    subject: str
+    task: str
+    deadline: datetime
+    group_name: str
+    category: str
+    is_important: bool
+    created_at: datetime
+    reminded_week: bool
+    reminded_day: bool
+    next_reminder_at: Optional[datetime]
+    
+    @property
+    def deadline_moscow(self):
+        """Получить время дедлайна в московском часовом поясе"""
+        return TimeManager.from_db_to_moscow(self.deadline)
+    
+    @property
+    def time_left(self):
+        """Оставшееся время до дедлайна"""
+        return self.deadline_moscow - TimeManager.now()
+    
+    @property
+    def task_preview(self):
+        """Начало описания задания для списков"""
+        return self.task[:TASK_PREVIEW_LENGTH]
+
+class DeadlineHeader(NamedTuple):
+    """
+    Заголовок дедлайна для списков и кнопок: без полного текста задания
+    category - только у групповых дедлайнов
+    """
+    id: int
+    subject: str
+    task_preview: str
+    deadline: datetime
+    category: Optional[str]
+
+class DeadlinePage(NamedTuple):
+    """Страница списка дедлайнов"""
+    items: list
+    has_prev: bool
+    has_next: bool
+
+def _header_columns(model):
+    """Колонки заголовка дедлайна: начало задания обрезается в самом запросе"""
+    return [
+        model.id,
+        model.subject,
+        func.substr(model.task, 1, TASK_PREVIEW_LENGTH),
+        model.deadline,
+        model.category if model is GroupDeadline else literal(None),
+    ]
+
+def _view_columns(model, view):
+    """Колонки модели в порядке полей модели для чтения"""
+    return [getattr(model, field) for field in view._fields]
+
+def _user_view(user):
+    """Модель для чтения из объекта User"""
+    return UserView._make(getattr(user, field) for field in UserView._fields)
+
+# Настройки SQLite для рабочей базы: в режиме WAL чтение не ждет записи,
+# а запись ждет блокировку busy_timeout вместо ошибки "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',     # в режиме WAL безопасно, fsync только на checkpoint
+    'busy_timeout': 5000,        # мс
+    'cache_size': -20000,        # ~20 МБ кэша страниц (отрицательное - в КБ)
+    'mmap_size': 134217728,      # 128 МБ
+    'temp_store': 'MEMORY',
+}
+
+def create_db_engine(database_url=None, pragmas=SQLITE_PRAGMAS):
+    """
+    Создает движок базы данных
+    
+    Args:
+        database_url: адрес базы, по умолчанию config.DATABASE_URL
+        pragmas: настройки SQLite, применяются к каждому новому подключению
+                 (None - настройки SQLite по умолчанию)
+    """
+    new_engine = create_engine(database_url or config.DATABASE_URL, echo=False)
+    
+    if new_engine.dialect.name == "sqlite" and pragmas:
+        @event.listens_for(new_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+    
+    return new_engine
+
 # Создаем движок базы данных
-engine = create_engine('sqlite:///deadlines.db', echo=False)
+engine = create_db_engine()
 Base.metadata.create_all(engine)
 Session = sessionmaker(bind=engine)
 
+# ========== МИГРАЦИИ СХЕМЫ ==========
+# create_all создает только недостающие таблицы и не меняет уже созданные,
+# поэтому новые колонки и индексы в существующей базе добавляют миграции.
+# Каждая миграция должна быть идемпотентной: после сбоя она может быть применена повторно.
+# Несколько процессов (перезапуск веб-приложения) применяют миграции по очереди:
+# каждая выполняется под блокировкой записи (BEGIN IMMEDIATE).
+
+class SchemaVersion(Base):
+    """
+    Примененные миграции схемы
+    """
+    __tablename__ = 'schema_version'
+    
+    version = Column(Integer, primary_key=True)
+    description = Column(String)
+    applied_at = Column(DateTime, default=datetime.now)
+
+def _create_indexes(connection, *names):
+    """Создает индексы моделей по именам, если их еще нет"""
+    indexes = {index.name: index for table in Base.metadata.sorted_tables for index in table.indexes}
+    for name in names:
+        indexes[name].create(bind=connection, checkfirst=True)
+
+def _migration_next_reminder_at(connection):
+    """Колонка next_reminder_at у личных и групповых дедлайнов"""
+    now_utc = TimeManager.now_utc().replace(tzinfo=None)
+    
+    for table in ('personal_deadlines', 'group_deadlines'):
+        # Колонки читаются заново, без кэша инспектора: их мог добавить другой процесс
+        columns = [row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")]
+        if 'next_reminder_at' in columns:
+            continue
+        
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN next_reminder_at DATETIME"))
+        
+        # Заполняем колонку только для предстоящих дедлайнов, старые остаются NULL.
+        # Запросы без моделей: у моделей могут быть колонки из более поздних миграций
+        completed = "is_completed" if table == 'personal_deadlines' else "0"
+        select_upcoming = text(
+            f"SELECT id, deadline, reminded_week, reminded_day, {completed} AS is_completed "
+            f"FROM {table} WHERE deadline > :now"
+        ).bindparams(bindparam('now', type_=DateTime)).columns(
+            id=Integer, deadline=DateTime, reminded_week=Boolean,
+            reminded_day=Boolean, is_completed=Boolean
+        )
+        rows = connection.execute(select_upcoming, {'now': now_utc}).all()
+        
+        updates = [
+            {
+                'id': row.id,
+                'next_reminder_at': None if row.is_completed else TimeManager.next_reminder_at(
+                    row.deadline, bool(row.reminded_week), bool(row.reminded_day), now_utc
+                ),
+            }
+            for row in rows
+        ]
+        if updates:
+            connection.execute(
+                text(f"UPDATE {table} SET next_reminder_at = :next_reminder_at WHERE id = :id")
+                .bindparams(bindparam('next_reminder_at', type_=DateTime)),
+                updates
+            )
+        logger.info(f"Добавлена колонка next_reminder_at в {table} ({len(updates)} дедлайнов)")
+
+def _migration_reminder_indexes(connection):
+    """Индексы для проверки напоминаний"""
+    _create_indexes(
+        connection,
+        'ix_personal_deadlines_next_reminder_at',
+        'ix_group_deadlines_next_reminder_at',
+        'ix_users_group_name',
+        'ix_reminder_outbox_status_next_attempt',
+    )
+
+def _migration_composite_indexes(connection):
+    """Составные индексы для списков дедлайнов и подписок"""
+    _create_indexes(
+        connection,
+        'ix_personal_deadlines_user_completed_deadline',
+        'ix_group_deadlines_group_deadline',
+        'ix_user_group_deadlines_user_deadline',
+    )
+
+# Пронумерованные миграции: (версия, функция)
+# Новые миграции добавляются только в конец, номера не меняются
+MIGRATIONS = [
+    (1, _migration_next_reminder_at),
+    (2, _migration_reminder_indexes),
+    (3, _migration_composite_indexes),
+]
+
+@contextmanager
+def _write_locked(bind):
+    """
+    Соединение в транзакции, которая сразу берет блокировку записи SQLite
+    (BEGIN IMMEDIATE): другие процессы ждут ее до busy_timeout.
+    Фиксируется при выходе из блока, при исключении откатывается
+    """
+    with bind.connect() as connection:
+        if connection.dialect.name == "sqlite":
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        yield connection
+        connection.commit()
+
+def migrate(bind=None):
+    """
+    Применяет к базе миграции, которых еще нет в schema_version
+    Безопасно при одновременном запуске нескольких процессов
+    
+    Returns:
+        Номер текущей версии схемы
+    """
+    bind = bind or engine
+    with _write_locked(bind) as connection:
+        SchemaVersion.__table__.create(bind=connection, checkfirst=True)
+    
+    # Без блокировки: обычно все миграции уже применены
+    with bind.connect() as connection:
+        applied = set(connection.execute(text("SELECT version FROM schema_version")).scalars())
+    
+    for version, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        
+        description = migration.__doc__.strip()
+        with _write_locked(bind) as connection:
+            # Пока ждали блокировку, миграцию мог применить другой процесс
+            already_applied = connection.execute(
+                text("SELECT 1 FROM schema_version WHERE version = :version"), {'version': version}
+            ).first()
+            if not already_applied:
+                migration(connection)
+                connection.execute(
+                    sqlite_insert(SchemaVersion.__table__).on_conflict_do_nothing(),
+                    {'version': version, 'description': description, 'applied_at': datetime.now()}
+                )
+        if not already_applied:
+            logger.info(f"Применена миграция {version}: {description}")
+        applied.add(version)
+    
+    return max(applied, default=0)
+
+migrate()
+
+# ========== ПОДПИСЧИКИ НА ИЗМЕНЕНИЯ ДЕДЛАЙНОВ ==========
+
+# Функции, которые вызываются после добавления, удаления или выполнения дедлайна
+# (например, планировщик напоминаний переставляет свои таймеры)
+_deadline_listeners = []
+
+def add_deadline_listener(callback):
+    """
+    Регистрирует обработчик изменений дедлайнов
+    
+    Args:
+        callback: функция callback(deadline_type, deadline_ids),
+                  deadline_type - "personal" или "group",
+                  deadline_ids - список ID измененных дедлайнов
+                  (при массовом добавлении приходит сразу весь пакет)
+    """
+    _deadline_listeners.append(callback)
+
+def _notify_deadline_changed(deadline_type, *deadline_ids):
+    """
+    Сообщает подписчикам об изменении одного или нескольких дедлайнов
+    Ошибки подписчиков не должны ломать работу с базой
+    """
+    if not deadline_ids:
+        return
+    
+    for callback in _deadline_listeners:
+        try:
+            callback(deadline_type, list(deadline_ids))
+        except Exception as e:
+            logger.error(f"Ошибка в обработчике изменения дедлайнов {deadline_type} {list(deadline_ids)}: {e}")
+
+# Функции, которые вызываются после смены группы или настроек уведомлений пользователя
+# (например, планировщик досылает напоминания, которые пользователь пропустил)
+_user_listeners = []
+
+def add_user_listener(callback):
+    """
+    Регистрирует обработчик изменений пользователя
+    
+    Args:
+        callback: функция callback(telegram_id)
+    """
+    _user_listeners.append(callback)
+
+def _notify_user_changed(telegram_id):
+    """
+    Сообщает подписчикам об изменении пользователя
+    Ошибки подписчиков не должны ломать работу с базой
+    """
+    for callback in _user_listeners:
+        try:
+            callback(telegram_id)
+        except Exception as e:
+            logger.error(f"Ошибка в обработчике изменения пользователя {telegram_id}: {e}")
+
+# ========== КЭШ ИДЕНТИФИКАТОРОВ ПОЛЬЗОВАТЕЛЕЙ ==========
+
+# Размер кэша telegram_id -> users.id и время жизни записи (None - без ограничения)
+USER_ID_CACHE_SIZE = 10000
+USER_ID_CACHE_TTL = None
+
+class UserIdCache:
+    """
+    LRU-кэш telegram_id -> users.id ограниченного размера с необязательным TTL
+    Потокобезопасный: к базе обращаются из пула потоков async_database
+    """
+    
+    def __init__(self, max_size=USER_ID_CACHE_SIZE, ttl=USER_ID_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl  # секунд
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # telegram_id -> (users.id, когда записан)
+        self._lock = threading.Lock()
+    
+    def get(self, telegram_id):
+        """Возвращает users.id или None, если в кэше нет"""
+        with self._lock:
+            item = self._items.get(telegram_id)
+            if item is not None and self.ttl is not None and time.monotonic() - item[1] > self.ttl:
+                del self._items[telegram_id]
+                item = None
+            
+            if item is None:
+                self.misses += 1
+                return None
+            
+            self._items.move_to_end(telegram_id)
+            self.hits += 1
+            return item[0]
+    
+    def put(self, telegram_id, user_id):
+        """Запоминает users.id, вытесняя самую старую запись при переполнении"""
+        with self._lock:
+            self._items[telegram_id] = (user_id, time.monotonic())
+            self._items.move_to_end(telegram_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+    
+    def invalidate(self, telegram_id):
+        """Удаляет запись пользователя"""
+        with self._lock:
+            self._items.pop(telegram_id, None)
+    
+    def clear(self):
+        """Очищает кэш"""
+        with self._lock:
+            self._items.clear()
+
+user_id_cache = UserIdCache()
+
+# Изменения пользователя сбрасывают его запись
+add_user_listener(user_id_cache.invalidate)
+
+def _resolve_user_id(session, telegram_id):
+    """
+    Возвращает users.id по Telegram ID: из кэша или одним запросом
+    None, если пользователя нет
+    """
+    user_id = user_id_cache.get(telegram_id)
+    if user_id is None:
+        user_id = session.query(User.id).filter(User.telegram_id == telegram_id).scalar()
+        if user_id is not None:
+            user_id_cache.put(telegram_id, user_id)
+    return user_id
+
 # ========== ФУНКЦИИ ДЛЯ РАБОТЫ С ПОЛЬЗОВАТЕЛЯМИ ==========
 
 def get_or_create_user(telegram_id: int, username: str = None, first_name: str = None, last_name: str = None):
     """
     Получает пользователя из базы или создает нового
-    Возвращает объект User или None при ошибке
+    Возвращает UserView или None при ошибке
     """
     session = Session()
     try:
@@ -183,23 +734,9 @@ def get_or_create_user(telegram_id: int, username: str = None, first_name: str =
             session.refresh(user)  # Обновляем, чтобы получить ID
             logger.info(f"Создан новый пользователь {telegram_id}")
         
-        # Создаем новый объект с теми же данными, но без привязки к сессии
-        user_data = {
-            'id': user.id,
-            'telegram_id': user.telegram_id,
-            'username': user.username,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'group_name': user.group_name,
-            'is_admin': user.is_admin,
-            'created_at': user.created_at,
-            'notify_week': user.notify_week,
-            'notify_day': user.notify_day,
-        }
+        user_id_cache.put(user.telegram_id, user.id)
         
-        # Создаем новый объект User с теми же данными
-        detached_user = User(**user_data)
-        return detached_user
+        return _user_view(user)
         
     except Exception as e:
         logger.error(f"Ошибка в get_or_create_user для {telegram_id}: {e}")
@@ -220,6 +757,7 @@ def set_user_group(telegram_id, group_name):
             user.group_name = group_name
             session.commit()
             logger.info(f"Пользователь {telegram_id} добавлен в группу {group_name}")
+            _notify_user_changed(telegram_id)
             return True
         return False
     except Exception as e:
@@ -229,30 +767,47 @@ def set_user_group(telegram_id, group_name):
     finally:
         session.close()
 
+def set_user_notifications(telegram_id, notify_week=None, notify_day=None):
+    """
+    Меняет настройки напоминаний пользователя (None - оставить как есть)
+    Возвращает UserView или None, если пользователь не найден
+    """
+    session = Session()
+    try:
+        user = session.query(User).filter(User.telegram_id == telegram_id).first()
+        if not user:
+            return None
+        
+        if notify_week is not None:
+            user.notify_week = notify_week
+        if notify_day is not None:
+            user.notify_day = notify_day
+        session.commit()
+        logger.info(f"Настройки напоминаний пользователя {telegram_id}: неделя={user.notify_week}, день={user.notify_day}")
+        user_view = _user_view(user)
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Ошибка при изменении настроек напоминаний: {e}")
+        raise
+    finally:
+        session.close()
+    
+    _notify_user_changed(telegram_id)
+    return user_view
+
 def get_user_by_telegram_id(telegram_id):
     """
     Получает пользователя по его Telegram ID
-    Возвращает открепленный объект User
+    Возвращает UserView или None
     """
     session = Session()
     try:
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if user:
-            # Создаем новый объект с теми же данными, но без привязки к сессии
-            user_data = {
-                'id': user.id,
-                'telegram_id': user.telegram_id,
-                'username': user.username,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'group_name': user.group_name,
-                'is_admin': user.is_admin,
-                'created_at': user.created_at,
-                'notify_week': user.notify_week,
-                'notify_day': user.notify_day,
-            }
-            detached_user = User(**user_data)
-            return detached_user
+        row = session.query(*_view_columns(User, UserView)).filter(
+            User.telegram_id == telegram_id
+        ).first()
+        if row:
+            user_id_cache.put(row.telegram_id, row.id)
+            return UserView._make(row)
         return None
     finally:
         session.close()
@@ -275,8 +830,8 @@ def add_personal_deadline(telegram_id, subject, task, deadline, priority="Сре
     """
     session = Session()
     try:
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user:
+        user_id = _resolve_user_id(session, telegram_id)
+        if not user_id:
             logger.error(f"Пользователь {telegram_id} не найден")
             return None
         
@@ -289,15 +844,17 @@ def add_personal_deadline(telegram_id, subject, task, deadline, priority="Сре
             deadline = TimeManager.to_utc_for_db(deadline)
         
         new_deadline = Deadline(
-            user_id=user.id,
+            user_id=user_id,
             subject=subject,
             task=task,
             deadline=deadline,  # Теперь в UTC
-            priority=priority
+            priority=priority,
+            next_reminder_at=TimeManager.next_reminder_at(deadline)
         )
         session.add(new_deadline)
         session.commit()
         logger.info(f"Добавлен личный дедлайн для {telegram_id}: {subject}")
+        _notify_deadline_changed("personal", new_deadline.id)
         return new_deadline.id
     except Exception as e:
         session.rollback()
@@ -306,23 +863,195 @@ def add_personal_deadline(telegram_id, subject, task, deadline, priority="Сре
     finally:
         session.close()
 
+def _prepare_deadline_rows(deadlines, defaults):
+    """
+    Проверяет пакет дедлайнов и готовит строки для вставки
+    
+    Args:
+        deadlines: список словарей с ключами subject, task, deadline
+                   (московское время) и необязательными полями из defaults
+        defaults: значения необязательных полей по умолчанию
+        
+    Returns:
+        Список словарей-строк с deadline и next_reminder_at в UTC
+        
+    Raises:
+        ValueError: если хотя бы один дедлайн некорректен
+    """
+    rows = []
+    for number, item in enumerate(deadlines, 1):
+        subject = (item.get('subject') or '').strip()
+        task = (item.get('task') or '').strip()
+        deadline = item.get('deadline')
+        
+        if not subject or not task:
+            raise ValueError(f"дедлайн №{number}: не указан предмет или задание")
+        if not isinstance(deadline, datetime):
+            raise ValueError(f"дедлайн №{number}: некорректная дата {deadline!r}")
+        
+        deadline_utc = TimeManager.to_utc_for_db(deadline)
+        row = {
+            'subject': subject,
+            'task': task,
+            'deadline': deadline_utc,
+            'next_reminder_at': TimeManager.next_reminder_at(deadline_utc)
+        }
+        for key, default in defaults.items():
+            value = item.get(key)
+            row[key] = default if value is None else value
+        rows.append(row)
+    
+    return rows
+
+def add_personal_deadlines_bulk(telegram_id, deadlines):
+    """
+    Добавляет пакет личных дедлайнов одной транзакцией
+    
+    Весь пакет проверяется заранее: если хотя бы один дедлайн некорректен,
+    ничего не добавляется. Строки вставляются одним executemany,
+    а таймеры напоминаний ставятся сразу на весь пакет
+    
+    Args:
+        telegram_id: ID пользователя в Telegram
+        deadlines: список словарей subject, task, deadline (московское время)
+                   и необязательно priority
+        
+    Returns:
+        Список ID новых дедлайнов в порядке входных данных или None при ошибке
+    """
+    session = Session()
+    try:
+        user_id = _resolve_user_id(session, telegram_id)
+        if not user_id:
+            logger.error(f"Пользователь {telegram_id} не найден")
+            return None
+        
+        rows = _prepare_deadline_rows(deadlines, {'priority': "Средний"})
+        if not rows:
+            return []
+        for row in rows:
+            row['user_id'] = user_id
+        
+        result = session.execute(
+            insert(Deadline).returning(Deadline.id, sort_by_parameter_order=True),
+            rows
+        )
+        ids = list(result.scalars())
+        session.commit()
+        logger.info(f"Добавлено {len(ids)} личных дедлайнов для {telegram_id}")
+        _notify_deadline_changed("personal", *ids)
+        return ids
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Ошибка при массовом добавлении личных дедлайнов: {e}")
+        return None
+    finally:
+        session.close()
+
 def get_personal_deadlines(telegram_id, include_completed=False):
     """
     Получает личные дедлайны пользователя
     """
     session = Session()
     try:
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user:
+        user_id = _resolve_user_id(session, telegram_id)
+        if not user_id:
             return []
         
-        query = session.query(Deadline).filter(Deadline.user_id == user.id)
+        query = session.query(*_view_columns(Deadline, PersonalDeadlineView)).filter(
+            Deadline.user_id == user_id
+        )
         
         if not include_completed:
             query = query.filter(Deadline.is_completed == False)
         
-        deadlines = query.order_by(Deadline.deadline).all()
-        return deadlines
+        return list(map(PersonalDeadlineView._make, query.order_by(Deadline.deadline)))
+    finally:
+        session.close()
+
+# Сколько дедлайнов на одной странице списка
+PAGE_SIZE = 5
+
+def _keyset_page(query, model, view, after=None, before=None, page_size=PAGE_SIZE):
+    """
+    Страница списка по ключу (deadline, id): WHERE (deadline, id) > (...) LIMIT page_size + 1
+    Стоимость не зависит от номера страницы и длины списка
+    Строки запроса должны идти в порядке полей view
+    
+    Args:
+        after: (deadline, id) последнего элемента предыдущей страницы
+        before: (deadline, id) первого элемента следующей страницы
+    
+    Returns:
+        DeadlinePage
+    """
+    key = tuple_(model.deadline, model.id)
+    
+    if before is not None:
+        rows = query.filter(key < tuple_(*before)).order_by(
+            model.deadline.desc(), model.id.desc()
+        ).limit(page_size + 1).all()
+        items = [view._make(row) for row in reversed(rows[:page_size])]
+        return DeadlinePage(items, len(rows) > page_size, True)
+    
+    if after is not None:
+        query = query.filter(key > tuple_(*after))
+    rows = query.order_by(model.deadline, model.id).limit(page_size + 1).all()
+    items = [view._make(row) for row in rows[:page_size]]
+    return DeadlinePage(items, after is not None, len(rows) > page_size)
+
+def list_personal_deadline_headers(telegram_id, after=None, before=None, page_size=PAGE_SIZE):
+    """
+    Страница заголовков активных личных дедлайнов пользователя (см. _keyset_page)
+    """
+    session = Session()
+    try:
+        user_id = _resolve_user_id(session, telegram_id)
+        if not user_id:
+            return DeadlinePage([], False, False)
+        
+        query = session.query(*_header_columns(Deadline)).filter(
+            Deadline.user_id == user_id,
+            Deadline.is_completed == False
+        )
+        return _keyset_page(query, Deadline, DeadlineHeader, after, before, page_size)
+    finally:
+        session.close()
+
+def count_personal_deadlines(telegram_id):
+    """
+    Число активных и выполненных личных дедлайнов пользователя одним запросом
+    Возвращает словарь {'active': ..., 'completed': ...}
+    """
+    counts = {'active': 0, 'completed': 0}
+    session = Session()
+    try:
+        user_id = _resolve_user_id(session, telegram_id)
+        if not user_id:
+            return counts
+        
+        rows = session.query(
+            Deadline.is_completed, func.count(Deadline.id)
+        ).filter(
+            Deadline.user_id == user_id
+        ).group_by(Deadline.is_completed)
+        
+        for is_completed, count in rows:
+            counts['completed' if is_completed else 'active'] = count
+        return counts
+    finally:
+        session.close()
+
+def get_personal_deadline(deadline_id):
+    """
+    Получает личный дедлайн по ID или None
+    """
+    session = Session()
+    try:
+        row = session.query(*_view_columns(Deadline, PersonalDeadlineView)).filter(
+            Deadline.id == deadline_id
+        ).first()
+        return PersonalDeadlineView._make(row) if row else None
     finally:
         session.close()
 
@@ -332,19 +1061,21 @@ def mark_personal_deadline_completed(deadline_id, telegram_id):
     """
     session = Session()
     try:
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user:
+        user_id = _resolve_user_id(session, telegram_id)
+        if not user_id:
             return False
         
         deadline = session.query(Deadline).filter(
             Deadline.id == deadline_id,
-            Deadline.user_id == user.id
+            Deadline.user_id == user_id
         ).first()
         
         if deadline:
             deadline.is_completed = True
+            deadline.next_reminder_at = None
             session.commit()
             logger.info(f"Дедлайн {deadline_id} отмечен как выполненный")
+            _notify_deadline_changed("personal", deadline_id)
             return True
         return False
     except Exception as e:
@@ -374,8 +1105,8 @@ def add_group_deadline(creator_telegram_id, subject, task, deadline, group_name,
     """
     session = Session()
     try:
-        creator = session.query(User).filter(User.telegram_id == creator_telegram_id).first()
-        if not creator:
+        creator_id = _resolve_user_id(session, creator_telegram_id)
+        if not creator_id:
             logger.error(f"Создатель {creator_telegram_id} не найден")
             return None
         
@@ -383,17 +1114,19 @@ def add_group_deadline(creator_telegram_id, subject, task, deadline, group_name,
         deadline_utc = TimeManager.to_utc_for_db(deadline)
         
         new_deadline = GroupDeadline(
-            creator_id=creator.id,
+            creator_id=creator_id,
             subject=subject,
             task=task,
             deadline=deadline_utc,  # Теперь в UTC
             group_name=group_name,
             category=category,
-            is_important=is_important
+            is_important=is_important,
+            next_reminder_at=TimeManager.next_reminder_at(deadline_utc)
         )
         session.add(new_deadline)
         session.commit()
         logger.info(f"Добавлен групповой дедлайн: {subject} для группы {group_name}")
+        _notify_deadline_changed("group", new_deadline.id)
         return new_deadline.id
     except Exception as e:
         session.rollback()
@@ -402,13 +1135,59 @@ def add_group_deadline(creator_telegram_id, subject, task, deadline, group_name,
     finally:
         session.close()
 
+def add_group_deadlines_bulk(creator_telegram_id, group_name, deadlines):
+    """
+    Добавляет пакет групповых дедлайнов одной транзакцией
+    
+    Как и add_personal_deadlines_bulk: пакет проверяется целиком,
+    вставляется одним executemany, таймеры ставятся на все дедлайны сразу
+    
+    Args:
+        creator_telegram_id: ID создателя в Telegram
+        group_name: Название группы
+        deadlines: список словарей subject, task, deadline (московское время)
+                   и необязательно category, is_important
+        
+    Returns:
+        Список ID новых дедлайнов в порядке входных данных или None при ошибке
+    """
+    session = Session()
+    try:
+        creator_id = _resolve_user_id(session, creator_telegram_id)
+        if not creator_id:
+            logger.error(f"Создатель {creator_telegram_id} не найден")
+            return None
+        
+        rows = _prepare_deadline_rows(deadlines, {'category': "homework", 'is_important': False})
+        if not rows:
+            return []
+        for row in rows:
+            row['creator_id'] = creator_id
+            row['group_name'] = group_name
+        
+        result = session.execute(
+            insert(GroupDeadline).returning(GroupDeadline.id, sort_by_parameter_order=True),
+            rows
+        )
+        ids = list(result.scalars())
+        session.commit()
+        logger.info(f"Добавлено {len(ids)} групповых дедлайнов для группы {group_name}")
+        _notify_deadline_changed("group", *ids)
+        return ids
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Ошибка при массовом добавлении групповых дедлайнов: {e}")
+        return None
+    finally:
+        session.close()
+
 def get_group_deadlines(group_name=None, category=None):
     """
     Получает групповые дедлайны
     """
     session = Session()
     try:
-        query = session.query(GroupDeadline)
+        query = session.query(*_view_columns(GroupDeadline, GroupDeadlineView))
         
         if group_name:
             query = query.filter(GroupDeadline.group_name == group_name)
@@ -417,10 +1196,22 @@ def get_group_deadlines(group_name=None, category=None):
             query = query.filter(GroupDeadline.category == category)
         
         # Не показываем прошедшие дедлайны
-        query = query.filter(GroupDeadline.deadline >= datetime.now())
+        query = query.filter(GroupDeadline.deadline >= TimeManager.now_for_db())
         
-        deadlines = query.order_by(GroupDeadline.deadline).all()
-        return deadlines
+        return list(map(GroupDeadlineView._make, query.order_by(GroupDeadline.deadline)))
+    finally:
+        session.close()
+
+def get_group_deadline(deadline_id):
+    """
+    Получает групповой дедлайн по ID или None
+    """
+    session = Session()
+    try:
+        row = session.query(*_view_columns(GroupDeadline, GroupDeadlineView)).filter(
+            GroupDeadline.id == deadline_id
+        ).first()
+        return GroupDeadlineView._make(row) if row else None
     finally:
         session.close()
 
@@ -431,16 +1222,50 @@ def get_user_group_deadlines(telegram_id):
     """
     session = Session()
     try:
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user or not user.group_name:
-            return []
+        # Группа пользователя подставляется в тот же запрос
+        rows = session.query(*_view_columns(GroupDeadline, GroupDeadlineView)).join(
+            User, User.group_name == GroupDeadline.group_name
+        ).filter(
+            User.telegram_id == telegram_id,
+            GroupDeadline.deadline >= TimeManager.now_for_db()
+        ).order_by(GroupDeadline.deadline)
         
-        deadlines = session.query(GroupDeadline).filter(
-            GroupDeadline.group_name == user.group_name,
-            GroupDeadline.deadline >= datetime.now()
-        ).order_by(GroupDeadline.deadline).all()
-        
-        return deadlines
+        return list(map(GroupDeadlineView._make, rows))
+    finally:
+        session.close()
+
+def list_group_deadline_headers(telegram_id, after=None, before=None, page_size=PAGE_SIZE):
+    """
+    Страница заголовков предстоящих дедлайнов группы пользователя (см. _keyset_page)
+    """
+    session = Session()
+    try:
+        query = session.query(*_header_columns(GroupDeadline)).join(
+            User, User.group_name == GroupDeadline.group_name
+        ).filter(
+            User.telegram_id == telegram_id,
+            GroupDeadline.deadline >= TimeManager.now_for_db()
+        )
+        return _keyset_page(query, GroupDeadline, DeadlineHeader, after, before, page_size)
+    finally:
+        session.close()
+
+def count_group_deadlines_by_category(telegram_id):
+    """
+    Число предстоящих дедлайнов группы пользователя по категориям
+    Возвращает список (category, count) в порядке ближайшего дедлайна категории
+    """
+    session = Session()
+    try:
+        rows = session.query(
+            GroupDeadline.category, func.count(GroupDeadline.id)
+        ).join(
+            User, User.group_name == GroupDeadline.group_name
+        ).filter(
+            User.telegram_id == telegram_id,
+            GroupDeadline.deadline >= TimeManager.now_for_db()
+        ).group_by(GroupDeadline.category).order_by(func.min(GroupDeadline.deadline))
+        return [tuple(row) for row in rows]
     finally:
         session.close()
 
@@ -450,13 +1275,13 @@ def subscribe_to_group_deadline(telegram_id, group_deadline_id):
     """
     session = Session()
     try:
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user:
+        user_id = _resolve_user_id(session, telegram_id)
+        if not user_id:
             return False
         
         # Проверяем, не подписан ли уже
         existing = session.query(UserGroupDeadline).filter(
-            UserGroupDeadline.user_id == user.id,
+            UserGroupDeadline.user_id == user_id,
             UserGroupDeadline.group_deadline_id == group_deadline_id
         ).first()
         
@@ -464,7 +1289,7 @@ def subscribe_to_group_deadline(telegram_id, group_deadline_id):
             return False  # Уже подписан
         
         subscription = UserGroupDeadline(
-            user_id=user.id,
+            user_id=user_id,
             group_deadline_id=group_deadline_id,
             is_subscribed=True
         )
@@ -490,16 +1315,22 @@ def get_all_upcoming_deadlines():
     
     session = Session()
     try:
+        now_db = TimeManager.now_for_db()
+        
         # Личные дедлайны (не выполненные)
-        personal = session.query(Deadline).filter(
+        personal = list(map(PersonalDeadlineView._make, session.query(
+            *_view_columns(Deadline, PersonalDeadlineView)
+        ).filter(
             Deadline.is_completed == False,
-            Deadline.deadline >= datetime.now()
-        ).order_by(Deadline.deadline).all()
+            Deadline.deadline >= now_db
+        ).order_by(Deadline.deadline)))
         
         # Групповые дедлайны
-        group = session.query(GroupDeadline).filter(
-            GroupDeadline.deadline >= datetime.now()
-        ).order_by(GroupDeadline.deadline).all()
+        group = list(map(GroupDeadlineView._make, session.query(
+            *_view_columns(GroupDeadline, GroupDeadlineView)
+        ).filter(
+            GroupDeadline.deadline >= now_db
+        ).order_by(GroupDeadline.deadline)))
         
     finally:
         session.close()
@@ -512,19 +1343,25 @@ def delete_personal_deadline(deadline_id, telegram_id):
     """
     session = Session()
     try:
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user:
+        user_id = _resolve_user_id(session, telegram_id)
+        if not user_id:
             return False
         
         deadline = session.query(Deadline).filter(
             Deadline.id == deadline_id,
-            Deadline.user_id == user.id
+            Deadline.user_id == user_id
         ).first()
         
         if deadline:
             session.delete(deadline)
+            # Неотправленные напоминания удаленного дедлайна больше не нужны
+            session.query(ReminderOutbox).filter(
+                ReminderOutbox.deadline_type == "personal",
+                ReminderOutbox.deadline_id == deadline_id
+            ).delete(synchronize_session=False)
             session.commit()
             logger.info(f"Удален личный дедлайн {deadline_id}")
+            _notify_deadline_changed("personal", deadline_id)
             return True
         return False
         
@@ -541,19 +1378,28 @@ def delete_group_deadline(deadline_id, telegram_id):
     """
     session = Session()
     try:
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user:
+        user_id = _resolve_user_id(session, telegram_id)
+        if not user_id:
             return False
         
         deadline = session.query(GroupDeadline).filter(
             GroupDeadline.id == deadline_id,
-            GroupDeadline.creator_id == user.id
+            GroupDeadline.creator_id == user_id
         ).first()
         
         if deadline:
             session.delete(deadline)
+            # Неотправленные напоминания удаленного дедлайна больше не нужны
+            session.query(ReminderOutbox).filter(
+                ReminderOutbox.deadline_type == "group",
+                ReminderOutbox.deadline_id == deadline_id
+            ).delete(synchronize_session=False)
+            session.query(GroupReminderLedger).filter(
+                GroupReminderLedger.group_deadline_id == deadline_id
+            ).delete(synchronize_session=False)
             session.commit()
             logger.info(f"Удален групповой дедлайн {deadline_id}")
+            _notify_deadline_changed("group", deadline_id)
             return True
         return False
         
@@ -564,6 +1410,274 @@ def delete_group_deadline(deadline_id, telegram_id):
     finally:
         session.close()
 
+# ========== ПЛАНИРОВЩИК НАПОМИНАНИЙ ==========
+
+# Сколько последних проверок хранить в reminder_scans
+REMINDER_SCANS_KEEP = 1000
+
+def acquire_lease(name, holder, ttl):
+    """
+    Захватывает свободную или истекшую аренду либо продлевает свою
+    Одним UPSERT, поэтому два процесса не получат аренду одновременно
+    
+    Args:
+        name: имя аренды
+        holder: идентификатор процесса
+        ttl: timedelta, на сколько продлевается аренда
+    
+    Returns:
+        True, если аренда принадлежит holder
+    """
+    session = Session()
+    try:
+        now_utc = TimeManager.now_utc().replace(tzinfo=None)
+        statement = sqlite_insert(SchedulerLease).values(
+            name=name, holder=holder, expires_at=now_utc + ttl, renewed_at=now_utc
+        )
+        session.execute(statement.on_conflict_do_update(
+            index_elements=['name'],
+            set_={
+                'holder': statement.excluded.holder,
+                'expires_at': statement.excluded.expires_at,
+                'renewed_at': statement.excluded.renewed_at,
+            },
+            where=(SchedulerLease.holder == holder) | (SchedulerLease.expires_at < now_utc)
+        ))
+        session.commit()
+        
+        current = session.query(SchedulerLease.holder).filter(SchedulerLease.name == name).scalar()
+        return current == holder
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Ошибка при захвате аренды {name}: {e}")
+        return False
+    finally:
+        session.close()
+
+def record_reminder_scan(holder, started_at, duration_ms, error=None):
+    """
+    Записывает проверку напоминаний в журнал, старые записи удаляются
+    """
+    session = Session()
+    try:
+        scan = ReminderScan(holder=holder, started_at=started_at, duration_ms=duration_ms, error=error)
+        session.add(scan)
+        session.flush()
+        session.query(ReminderScan).filter(
+            ReminderScan.id <= scan.id - REMINDER_SCANS_KEEP
+        ).delete(synchronize_session=False)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Ошибка при записи проверки напоминаний: {e}")
+    finally:
+        session.close()
+
+def get_last_reminder_scan():
+    """
+    Возвращает последнюю проверку напоминаний (словарь) или None
+    """
+    session = Session()
+    try:
+        scan = session.query(ReminderScan).order_by(ReminderScan.id.desc()).first()
+        if not scan:
+            return None
+        return {
+            'holder': scan.holder,
+            'started_at': scan.started_at,
+            'duration_ms': scan.duration_ms,
+            'error': scan.error,
+        }
+    finally:
+        session.close()
+
+class StaleWhileRevalidateCache:
+    """
+    Кэш одного значения: свежее значение отдается сразу, устаревшее (но не старше
+    stale_ttl) тоже отдается сразу, а новое считается в фоновом потоке.
+    Без значения или со слишком старым вызывающий ждет загрузки
+    Потокобезопасный: одновременно выполняется не больше одной загрузки
+    """
+    
+    def __init__(self, loader, ttl, stale_ttl):
+        self.loader = loader
+        self.ttl = ttl              # секунд
+        self.stale_ttl = stale_ttl  # секунд
+        self.hits = 0
+        self.misses = 0
+        self._value = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+    
+    def get(self):
+        """Возвращает значение из кэша или загружает его"""
+        with self._lock:
+            age = time.monotonic() - self._loaded_at
+            if self._value is not None and age < self.stale_ttl:
+                self.hits += 1
+                if age >= self.ttl and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh, name="cache-refresh", daemon=True).start()
+                return self._value
+            self.misses += 1
+        
+        with self._load_lock:
+            # Пока ждали, значение мог загрузить другой поток
+            with self._lock:
+                if self._value is not None and time.monotonic() - self._loaded_at < self.ttl:
+                    return self._value
+            return self._load()
+    
+    def _load(self):
+        value = self.loader()
+        with self._lock:
+            self._value, self._loaded_at = value, time.monotonic()
+        return value
+    
+    def _refresh(self):
+        """Фоновое обновление устаревшего значения"""
+        try:
+            with self._load_lock:
+                self._load()
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении кэша: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+    
+    def clear(self):
+        """Очищает кэш"""
+        with self._lock:
+            self._value, self._loaded_at = None, 0.0
+
+def _load_bot_stats():
+    """
+    Считает статистику бота одним агрегирующим запросом:
+    разбивка по группам - GROUP BY по участникам и активным дедлайнам
+    (индексы users.group_name и group_deadlines(group_name, deadline)),
+    итоги по группам - оконными SUM() OVER () по той же разбивке,
+    пользователи и личные дедлайны - подзапросами в строке итогов
+    """
+    session = Session()
+    try:
+        now_db = TimeManager.now_for_db()
+        
+        # Участники и активные дедлайны групп одной таблицей: строка на участника
+        # и строка на дедлайн, затем суммы по группам
+        rows = union_all(
+            select(
+                User.group_name.label('group_name'),
+                literal(1).label('members'),
+                literal(0).label('deadlines'),
+                literal(0).label('important'),
+            ).where(User.group_name != None, User.group_name != ''),
+            select(
+                GroupDeadline.group_name,
+                literal(0),
+                literal(1),
+                cast(GroupDeadline.is_important, Integer),
+            ).where(GroupDeadline.deadline >= now_db),
+        ).subquery()
+        
+        by_group = select(
+            rows.c.group_name,
+            func.sum(rows.c.members).label('members'),
+            func.sum(rows.c.deadlines).label('deadlines'),
+            func.sum(rows.c.important).label('important'),
+        ).group_by(rows.c.group_name).cte('by_group')
+        
+        totals = select(
+            select(func.count()).select_from(User).scalar_subquery().label('users'),
+            select(func.count()).select_from(Deadline).where(
+                Deadline.is_completed == False,
+                Deadline.deadline >= now_db
+            ).scalar_subquery().label('deadlines'),
+        ).cte('totals')
+        
+        # Строка итогов присоединяется к каждой группе; без групп остается одна строка с NULL
+        result = session.execute(
+            select(
+                totals.c.users,
+                totals.c.deadlines,
+                func.sum(case((by_group.c.members > 0, 1), else_=0)).over().label('groups'),
+                func.sum(by_group.c.deadlines).over().label('group_deadlines'),
+                by_group.c.group_name,
+                by_group.c.members.label('group_members'),
+                by_group.c.deadlines.label('group_active'),
+                by_group.c.important.label('group_important'),
+            ).select_from(
+                totals.outerjoin(by_group, true())
+            ).order_by(by_group.c.members.desc(), by_group.c.group_name)
+        ).all()
+        
+        first = result[0]
+        return {
+            'users': first.users,
+            'deadlines': first.deadlines,
+            'groups': first.groups or 0,
+            'group_deadlines': first.group_deadlines or 0,
+            'by_group': [
+                {
+                    'group': row.group_name,
+                    'members': row.group_members,
+                    'deadlines': row.group_active,
+                    'important': row.group_important,
+                }
+                for row in result if row.group_name is not None
+            ],
+            'generated_at': now_db.isoformat() + 'Z',
+        }
+    finally:
+        session.close()
+
+bot_stats_cache = StaleWhileRevalidateCache(
+    _load_bot_stats, ttl=config.STATS_CACHE_TTL, stale_ttl=config.STATS_STALE_TTL
+)
+
+def get_bot_stats():
+    """
+    Общая статистика бота для /stats (из кэша, см. config.STATS_CACHE_TTL)
+    
+    Returns:
+        Словарь: users - пользователей, deadlines - активных личных дедлайнов,
+        groups - групп с участниками, group_deadlines - активных групповых дедлайнов,
+        by_group - участники и активные дедлайны каждой группы,
+        generated_at - когда статистика посчитана (UTC)
+    """
+    return bot_stats_cache.get()
+
+# Сколько последних update_id помнить (Telegram повторяет доставку в течение суток)
+PROCESSED_UPDATES_KEEP = 10000
+
+def claim_update(update_id):
+    """
+    Отмечает обновление Telegram как принятое
+    
+    Returns:
+        True, если обновление пришло впервые, False - если это повторная доставка
+        При ошибке базы возвращает True: лучше обработать повтор, чем потерять обновление
+    """
+    session = Session()
+    try:
+        result = session.execute(sqlite_insert(ProcessedUpdate).values(
+            update_id=update_id, received_at=TimeManager.now_utc().replace(tzinfo=None)
+        ).on_conflict_do_nothing(index_elements=['update_id']))
+        
+        # update_id растут, поэтому старые записи отрезаются по номеру
+        session.query(ProcessedUpdate).filter(
+            ProcessedUpdate.update_id <= update_id - PROCESSED_UPDATES_KEEP
+        ).delete(synchronize_session=False)
+        session.commit()
+        return result.rowcount == 1
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Ошибка при записи обновления {update_id}: {e}")
+        return True
+    finally:
+        session.close()
+
 # ========== ТЕСТОВЫЕ ФУНКЦИИ ==========
 
 def test_database():
@@ -642,5 +1756,231 @@ def log_current_time():
     logger.info(f"Текущее время UTC: {utc_now.strftime('%Y-%m-%d %H:%M:%S')}")
     logger.info(f"Текущее время Москва: {moscow_now.strftime('%Y-%m-%d %H:%M:%S')}")
 
+def benchmark_engine_profiles(operations=500, readers=4):
+    """
+    Сравнивает настройки SQLite по умолчанию и SQLITE_PRAGMAS
+    на временной базе: запись мелкими транзакциями (как в обработчиках),
+    чтение списков дедлайнов и чтение во время записи из нескольких потоков
+    """
+    import os
+    import tempfile
+    import threading
+    import time
+    from datetime import timedelta
+    
+    print("=" * 60)
+    print(f"Сравнение настроек SQLite: {operations} операций, {readers} читателей")
+    print("=" * 60)
+    
+    for profile, pragmas in (("по умолчанию", None), ("SQLITE_PRAGMAS", SQLITE_PRAGMAS)):
+        directory = tempfile.mkdtemp()
+        bench_engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", pragmas)
+        Base.metadata.create_all(bench_engine)
+        BenchSession = sessionmaker(bind=bench_engine)
+        
+        session = BenchSession()
+        user = User(telegram_id=1)
+        session.add(user)
+        session.commit()
+        user_id = user.id
+        session.close()
+        
+        def write(count):
+            for i in range(count):
+                session = BenchSession()
+                session.add(Deadline(
+                    user_id=user_id, subject="Тест", task=f"Задание {i}",
+                    deadline=datetime.now() + timedelta(days=i % 30)
+                ))
+                session.commit()
+                session.close()
+        
+        def read(count, errors):
+            for _ in range(count):
+                session = BenchSession()
+                try:
+                    session.query(Deadline).filter(
+                        Deadline.user_id == user_id, Deadline.is_completed == False
+                    ).order_by(Deadline.deadline).limit(20).all()
+                except Exception:
+                    errors.append(1)
+                finally:
+                    session.close()
+        
+        started = time.perf_counter()
+        write(operations)
+        write_rate = operations / (time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        read(operations, [])
+        read_rate = operations / (time.perf_counter() - started)
+        
+        # Чтение во время записи
+        errors = []
+        threads = [threading.Thread(target=write, args=(operations,))]
+        threads += [threading.Thread(target=read, args=(operations, errors)) for _ in range(readers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        mixed_rate = operations * (readers + 1) / (time.perf_counter() - started)
+        
+        bench_engine.dispose()
+        
+        print(f"{profile}:")
+        print(f"  Запись: {write_rate:.0f} транзакций/с")
+        print(f"  Чтение: {read_rate:.0f} запросов/с")
+        print(f"  Чтение + запись: {mixed_rate:.0f} операций/с, ошибок чтения: {len(errors)}")
+    
+    print("=" * 60)
+
+def benchmark_read_models(deadlines_count=500, repeats=20):
+    """
+    Сравнивает чтение списка дедлайнов объектами ORM и кортежами PersonalDeadlineView
+    на временной базе: время построения списка и память на один элемент
+    """
+    import os
+    import tempfile
+    import time
+    import tracemalloc
+    from datetime import timedelta
+    
+    print("=" * 60)
+    print(f"Сравнение моделей для чтения: {deadlines_count} дедлайнов")
+    print("=" * 60)
+    
+    directory = tempfile.mkdtemp()
+    bench_engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    Base.metadata.create_all(bench_engine)
+    BenchSession = sessionmaker(bind=bench_engine)
+    
+    session = BenchSession()
+    user = User(telegram_id=1)
+    session.add(user)
+    session.flush()
+    session.add_all([
+        Deadline(user_id=user.id, subject="Тест", task=f"Задание {i}",
+                 deadline=datetime.now() + timedelta(hours=i))
+        for i in range(deadlines_count)
+    ])
+    session.commit()
+    user_id = user.id
+    session.close()
+    
+    def load_orm():
+        session = BenchSession()
+        try:
+            return session.query(Deadline).filter(
+                Deadline.user_id == user_id
+            ).order_by(Deadline.deadline).all()
+        finally:
+            session.close()
+    
+    def load_views():
+        session = BenchSession()
+        try:
+            return list(map(PersonalDeadlineView._make, session.query(
+                *_view_columns(Deadline, PersonalDeadlineView)
+            ).filter(Deadline.user_id == user_id).order_by(Deadline.deadline)))
+        finally:
+            session.close()
+    
+    for name, load in (("ORM Deadline", load_orm), ("PersonalDeadlineView", load_views)):
+        load()  # прогрев
+        started = time.perf_counter()
+        for _ in range(repeats):
+            load()
+        elapsed_ms = (time.perf_counter() - started) * 1000 / repeats
+        
+        tracemalloc.start()
+        items = load()
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        print(f"{name}:")
+        print(f"  Построение списка: {elapsed_ms:.1f} мс")
+        print(f"  Память на элемент: {memory / len(items):.0f} байт")
+        del items
+    
+    bench_engine.dispose()
+    print("=" * 60)
+
+def benchmark_bulk_insert(deadlines_count=500):
+    """
+    Сравнивает добавление дедлайнов по одному (транзакция на каждый, как add_personal_deadline)
+    и одним executemany в одной транзакции (как add_personal_deadlines_bulk) на временной базе
+    """
+    import os
+    import tempfile
+    import time
+    from datetime import timedelta
+    
+    print("=" * 60)
+    print(f"Массовое добавление: {deadlines_count} дедлайнов")
+    print("=" * 60)
+    
+    directory = tempfile.mkdtemp()
+    bench_engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    Base.metadata.create_all(bench_engine)
+    BenchSession = sessionmaker(bind=bench_engine)
+    
+    session = BenchSession()
+    user = User(telegram_id=1)
+    session.add(user)
+    session.commit()
+    user_id = user.id
+    session.close()
+    
+    items = [
+        {'subject': "Тест", 'task': f"Задание {i}", 'deadline': TimeManager.now() + timedelta(hours=i)}
+        for i in range(deadlines_count)
+    ]
+    
+    def insert_one_by_one():
+        ids = []
+        for item in items:
+            session = BenchSession()
+            try:
+                deadline_utc = TimeManager.to_utc_for_db(item['deadline'])
+                new_deadline = Deadline(
+                    user_id=user_id, subject=item['subject'], task=item['task'],
+                    deadline=deadline_utc, next_reminder_at=TimeManager.next_reminder_at(deadline_utc)
+                )
+                session.add(new_deadline)
+                session.commit()
+                ids.append(new_deadline.id)
+            finally:
+                session.close()
+        return ids
+    
+    def insert_bulk():
+        session = BenchSession()
+        try:
+            rows = _prepare_deadline_rows(items, {'priority': "Средний"})
+            for row in rows:
+                row['user_id'] = user_id
+            ids = list(session.execute(
+                insert(Deadline).returning(Deadline.id, sort_by_parameter_order=True), rows
+            ).scalars())
+            session.commit()
+            return ids
+        finally:
+            session.close()
+    
+    for name, add in (("По одному", insert_one_by_one), ("executemany", insert_bulk)):
+        started = time.perf_counter()
+        ids = add()
+        elapsed = time.perf_counter() - started
+        
+        print(f"{name}:")
+        print(f"  Время: {elapsed * 1000:.0f} мс ({len(ids) / elapsed:.0f} дедлайнов/сек)")
+    
+    bench_engine.dispose()
+    print("=" * 60)
+
 if __name__ == "__main__":
-    test_database()
\ No newline at end of file
+    test_database()
+    benchmark_engine_profiles()
+    benchmark_read_models()
+    benchmark_bulk_insert()
\ No newline at end of file
@@ -0,0 +1,381 @@
+"""
+importer.py - Импорт групповых дедлайнов из CSV и iCalendar (.ics)
+
+Файл читается построчно, а дедлайны добавляются пакетами по IMPORT_BATCH_SIZE
+(каждый пакет - одна транзакция), поэтому расписание из тысяч строк
+не загружается в память целиком
+"""
+
+import csv
+import io
+import itertools
+import logging
+import re
+import time
+import database as db
+import keyboards as kb
+from utils.time_utils import TimeManager
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 200      # дедлайнов в одной транзакции
+IMPORT_FORMATS = ("csv", "ics")
+MAX_IMPORT_FILE_SIZE = 20 * 1024 * 1024  # Bot API не отдает ботам файлы больше 20 МБ
+MAX_REPORTED_ERRORS = 10     # сколько ошибок показывать пользователю
+PROGRESS_INTERVAL = 2.0      # секунд между сообщениями о прогрессе
+
+# Названия колонок CSV (в нижнем регистре) -> поле дедлайна
+CSV_COLUMNS = {
+    "subject": "subject", "предмет": "subject",
+    "task": "task", "задание": "task",
+    "deadline": "deadline", "дедлайн": "deadline", "date": "deadline", "дата": "deadline",
+    "time": "time", "время": "time",
+    "category": "category", "категория": "category",
+    "important": "is_important", "is_important": "is_important", "важный": "is_important",
+}
+
+TRUE_VALUES = {"1", "true", "yes", "y", "да", "+"}
+
+# ========== ПРОВЕРКА СТРОК ==========
+
+def detect_format(file_name):
+    """Определяет формат файла по расширению: "csv", "ics" или None"""
+    extension = (file_name or "").rsplit(".", 1)[-1].lower()
+    return extension if extension in IMPORT_FORMATS else None
+
+def _parse_category(value):
+    """Категория по ключу ("test") или по названию с кнопки ("📄 Зачеты")"""
+    value = (value or "").strip()
+    if not value:
+        return "homework"
+    if value.lower() in kb.CATEGORIES:
+        return value.lower()
+    for key, display_name in kb.CATEGORIES.items():
+        if value == display_name or value.lower() == display_name.split(" ", 1)[-1].lower():
+            return key
+    raise ValueError(f"неизвестная категория '{value}'")
+
+def _validate_item(subject, task, deadline, category=None, is_important=False):
+    """
+    Проверяет дедлайн по тем же правилам, что и пошаговое добавление
+
+    Returns:
+        Словарь для db.add_group_deadlines_bulk
+
+    Raises:
+        ValueError: с описанием ошибки
+    """
+    subject = (subject or "").strip()
+    task = (task or "").strip()
+
+    if len(subject) < 2 or len(subject) > 100:
+        raise ValueError("название предмета должно быть от 2 до 100 символов")
+    if len(task) < 2 or len(task) > 500:
+        raise ValueError("описание задания должно быть от 2 до 500 символов")
+    if deadline <= TimeManager.now():
+        raise ValueError("дата уже прошла")
+
+    return {
+        'subject': subject,
+        'task': task,
+        'deadline': deadline,
+        'category': _parse_category(category),
+        'is_important': bool(is_important),
+    }
+
+# ========== CSV ==========
+
+def iter_csv_deadlines(stream):
+    """
+    Читает дедлайны из CSV построчно
+
+    Первая строка - заголовок (см. CSV_COLUMNS), разделитель "," или ";".
+    Дата в формате ГГГГ-ММ-ДД ЧЧ:ММ, ДД.ММ.ГГГГ ЧЧ:ММ или без времени (23:59),
+    время можно указать и отдельной колонкой
+
+    Yields:
+        (номер строки, дедлайн или None, ошибка или None)
+    """
+    header_line = stream.readline()
+    delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
+    reader = csv.reader(itertools.chain([header_line], stream), delimiter=delimiter)
+
+    header = next(reader, None)
+    if not header:
+        yield 1, None, "пустой файл"
+        return
+
+    columns = [CSV_COLUMNS.get(name.strip().lower()) for name in header]
+    missing = {"subject", "task", "deadline"} - set(columns)
+    if missing:
+        yield 1, None, f"в заголовке нет колонок: {', '.join(sorted(missing))}"
+        return
+
+    while True:
+        try:
+            row = next(reader, None)
+        except csv.Error as e:
+            # Испорченная строка (например, поле больше csv.field_size_limit)
+            # пропускается, чтение продолжается со следующей
+            yield reader.line_num, None, f"ошибка CSV: {e}"
+            continue
+        if row is None:
+            break
+        if not any(cell.strip() for cell in row):
+            continue
+
+        fields = {column: cell.strip() for column, cell in zip(columns, row) if column}
+        try:
+            date_str, _, time_str = fields.get("deadline", "").partition(" ")
+            time_str = fields.get("time") or time_str.strip() or "23:59"
+            # Ошибки строк попадают в ImportResult.errors, а не в лог
+            deadline = TimeManager.parse_user_input(date_str, time_str, log_errors=False)
+
+            item = _validate_item(
+                fields.get("subject"), fields.get("task"), deadline,
+                fields.get("category"), fields.get("is_important", "").lower() in TRUE_VALUES
+            )
+            yield reader.line_num, item, None
+        except ValueError as e:
+            yield reader.line_num, None, str(e)
+
+# ========== ICALENDAR ==========
+
+def _unfold_ical_lines(stream):
+    """
+    Склеивает перенесенные строки iCalendar (продолжение начинается с пробела)
+
+    Yields:
+        (номер строки, строка)
+    """
+    current, current_number = None, 0
+    for number, line in enumerate(stream, 1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current_number, current
+        current, current_number = line, number
+
+    if current is not None:
+        yield current_number, current
+
+ICAL_ESCAPE = re.compile(r"\\([\\;,nN])")
+
+def _unescape_ical_text(value):
+    """
+    Раскрывает экранирование текста iCalendar (\\n, \\, \\; \\\\) за один проход,
+    чтобы экранированная обратная косая черта перед n не стала переводом строки
+    """
+    return ICAL_ESCAPE.sub(lambda match: "\n" if match.group(1) in "nN" else match.group(1), value)
+
+def iter_ics_deadlines(stream):
+    """
+    Читает дедлайны из iCalendar построчно
+
+    VEVENT берет дату из DTSTART, VTODO - из DUE (или DTSTART).
+    SUMMARY - предмет, DESCRIPTION - задание (если нет - тоже SUMMARY),
+    CATEGORIES - категория, PRIORITY 1-4 - важный дедлайн
+
+    Yields:
+        (номер строки BEGIN, дедлайн или None, ошибка или None)
+    """
+    component, start_line, properties = None, 0, {}
+    nested = 0  # глубина вложенных компонентов (VALARM), их свойства пропускаются
+
+    for number, line in _unfold_ical_lines(stream):
+        name_part, _, value = line.partition(":")
+        name, *params = name_part.split(";")
+        name = name.upper()
+
+        if component is None:
+            if name == "BEGIN" and value.upper() in ("VEVENT", "VTODO"):
+                component, start_line, properties = value.upper(), number, {}
+            continue
+        if name == "BEGIN":
+            nested += 1
+            continue
+        if nested:
+            nested -= name == "END"
+            continue
+        if name != "END":
+            properties[name] = (value, params)
+            continue
+
+        try:
+            date_property = "DUE" if component == "VTODO" and "DUE" in properties else "DTSTART"
+            if date_property not in properties:
+                raise ValueError("нет даты (DTSTART/DUE)")
+
+            date_value, date_params = properties[date_property]
+            tzid = next((param.split("=", 1)[1] for param in date_params
+                         if param.upper().startswith("TZID=")), None)
+            deadline = TimeManager.parse_ical_datetime(date_value, tzid)
+
+            summary = _unescape_ical_text(properties.get("SUMMARY", ("", []))[0])
+            description = _unescape_ical_text(properties.get("DESCRIPTION", ("", []))[0])
+            # Категории календаря произвольные: незнакомую заменяем на категорию по умолчанию
+            category = properties.get("CATEGORIES", ("", []))[0].split(",")[0]
+            try:
+                category = _parse_category(category)
+            except ValueError:
+                category = None
+            priority = properties.get("PRIORITY", ("0", []))[0]
+
+            item = _validate_item(
+                summary, description or summary, deadline, category,
+                priority.isdigit() and 1 <= int(priority) <= 4
+            )
+            yield start_line, item, None
+        except ValueError as e:
+            yield start_line, None, str(e)
+
+        component, properties = None, {}
+
+# ========== ИМПОРТ ==========
+
+class ImportResult:
+    """Итог импорта: сколько добавлено, сколько строк пропущено и первые ошибки"""
+
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        """
+        Запоминает ошибку (показываются только первые MAX_REPORTED_ERRORS)
+        line=None - ошибка всего файла, а не отдельной строки
+        """
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"строка {line}: {message}" if line else message)
+
+    def format_progress(self):
+        """Текст сообщения о ходе импорта"""
+        return f"⏳ Импорт... добавлено {self.imported}, пропущено {self.skipped}"
+
+    def format_summary(self):
+        """Текст итогового сообщения"""
+        message = f"✅ Импорт завершен: добавлено {self.imported}, пропущено {self.skipped}"
+        if self.errors:
+            message += "\n\n⚠️ Ошибки:\n" + "\n".join(f"• {error}" for error in self.errors)
+            if self.skipped > len(self.errors):
+                message += f"\n• ... и еще {self.skipped - len(self.errors)}"
+        return message
+
+    def to_dict(self):
+        return {'imported': self.imported, 'skipped': self.skipped, 'errors': self.errors}
+
+def import_group_deadlines(stream, file_format, creator_telegram_id, group_name,
+                           progress=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Импортирует групповые дедлайны из текстового потока
+
+    Args:
+        stream: текстовый поток с содержимым файла (читается построчно)
+        file_format: "csv" или "ics"
+        creator_telegram_id: ID создателя в Telegram
+        group_name: группа, в которую добавляются дедлайны
+        progress: необязательная функция progress(result), вызывается
+                  после пакета, но не чаще раза в PROGRESS_INTERVAL секунд
+        batch_size: дедлайнов в одной транзакции
+
+    Returns:
+        ImportResult
+    """
+    rows = iter_csv_deadlines(stream) if file_format == "csv" else iter_ics_deadlines(stream)
+    result = ImportResult()
+    batch, batch_lines = [], []
+    last_progress = time.monotonic()
+
+    def flush():
+        nonlocal last_progress
+        ids = db.add_group_deadlines_bulk(creator_telegram_id, group_name, batch)
+        if ids is None:
+            for line in batch_lines:
+                result.add_error(line, "ошибка базы данных")
+        else:
+            result.imported += len(ids)
+        batch.clear()
+        batch_lines.clear()
+
+        if progress and time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+            last_progress = time.monotonic()
+            progress(result)
+
+    try:
+        for line, item, error in rows:
+            if error:
+                result.add_error(line, error)
+                continue
+            batch.append(item)
+            batch_lines.append(line)
+            if len(batch) >= batch_size:
+                flush()
+    except UnicodeDecodeError:
+        result.add_error(None, "файл должен быть в кодировке UTF-8")
+    except csv.Error as e:
+        # Ошибки строк iter_csv_deadlines отдает сам, сюда попадает только
+        # непрочитанный файл; уже добавленные пакеты остаются в итоге
+        result.add_error(None, f"ошибка CSV: {e}")
+
+    if batch:
+        flush()
+
+    logger.info(f"📥 Импорт {file_format} для группы {group_name}: "
+                f"добавлено {result.imported}, пропущено {result.skipped}")
+    return result
+
+def open_text_stream(binary_stream):
+    """Оборачивает бинарный поток (файл, загрузка Flask) в текстовый UTF-8"""
+    return io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+
+# ========== ТЕСТИРОВАНИЕ ==========
+
+def test_importer():
+    """Проверка разбора CSV и iCalendar без обращения к базе"""
+    print("🧪 Тестирование импорта")
+
+    csv_text = (
+        "Предмет;Задание;Дата;Категория;Важный\n"
+        "Математика;Контрольная 1;2099-03-01 10:00;test;да\n"
+        "Физика;Лабораторная;01.04.2099;;\n"
+        "Х;Слишком короткий предмет;2099-03-01;;\n"
+        "История;Реферат;2000-01-01;;\n"
+    )
+    for line, item, error in iter_csv_deadlines(io.StringIO(csv_text)):
+        print(f"  CSV {line}: {item or error}")
+
+    ics_text = (
+        "BEGIN:VCALENDAR\r\n"
+        "BEGIN:VEVENT\r\n"
+        "SUMMARY:Программирование\r\n"
+        "DESCRIPTION:Сдать курсовую\\, часть 1\r\n"
+        "DTSTART;TZID=Europe/Moscow:20990515T120000\r\n"
+        "CATEGORIES:project\r\n"
+        "BEGIN:VALARM\r\n"
+        "DESCRIPTION:Напоминание\r\n"
+        "END:VALARM\r\n"
+        "END:VEVENT\r\n"
+        "BEGIN:VTODO\r\n"
+        "SUMMARY:Документы на сти\r\n"
+        " пендию\r\n"
+        "DUE;VALUE=DATE:20990601\r\n"
+        "PRIORITY:1\r\n"
+        "CATEGORIES:Учеба\r\n"
+        "END:VTODO\r\n"
+        "BEGIN:VEVENT\r\n"
+        "SUMMARY:Без даты\r\n"
+        "END:VEVENT\r\n"
+        "END:VCALENDAR\r\n"
+    )
+    for line, item, error in iter_ics_deadlines(io.StringIO(ics_text)):
+        print(f"  ICS {line}: {item or error}")
+
+    # Экранированная обратная косая черта перед n - не перевод строки
+    assert _unescape_ical_text("C:\\\\new\\nline\\, ok") == "C:\\new\nline, ok"
+
+if __name__ == "__main__":
+    test_importer()
@@ -0,0 +1,156 @@
+"""
+ingestion.py - Прием обновлений вебхука перед обработкой ботом
+
+Обновления попадают в ограниченную очередь и обрабатываются в цикле событий бота.
+Повторные доставки одного update_id отбрасываются, а при переполнении очереди
+вебхук отвечает 429, и Telegram повторяет доставку позже, вместо того чтобы
+накапливать в памяти бесконечную очередь.
+Проверка повторов через базу выполняется уже в цикле бота (через пул потоков базы),
+поэтому ответ вебхуку не ждет записи в SQLite
+"""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+import config
+import async_database as adb
+
+logger = logging.getLogger(__name__)
+
+DEDUPE_SIZE = 1000  # сколько последних update_id помнить в памяти
+
+# Результаты UpdateIngestor.submit
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+QUEUE_FULL = "queue_full"
+
+class UpdateIngestor:
+    """
+    Ограниченная очередь обновлений с отбрасыванием повторов
+
+    submit вызывается из любого потока (обработчики Flask),
+    run работает в цикле событий бота и передает обновления в process
+    """
+
+    def __init__(self, process, loop, max_depth=None, dedupe_size=DEDUPE_SIZE,
+                 persist=None, concurrent=False):
+        """
+        Args:
+            process: корутина process(update), например Application.process_update
+            loop: цикл событий, в котором работает run
+            max_depth: максимум ожидающих обработки обновлений
+            dedupe_size: сколько последних update_id помнить в памяти
+            persist: дополнительно проверять повторы через базу (db.claim_update)
+                     перед обработкой - так повторы отбрасывают все процессы
+            concurrent: обрабатывать обновления параллельно, не дожидаясь предыдущих
+                        (число одновременных ограничивает сам process)
+        """
+        self.process = process
+        self.loop = loop
+        self.concurrent = concurrent
+        self.max_depth = max_depth or config.WEBHOOK_QUEUE_SIZE
+        self.dedupe_size = dedupe_size
+        self.persist = config.WEBHOOK_DEDUPE_PERSIST if persist is None else persist
+
+        self._queue = asyncio.Queue()
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()  # update_id -> None, порядок - от старых к новым
+        self._depth = 0             # принято, но еще не обработано
+        self._tasks = set()         # обновления, обрабатываемые параллельно
+
+        # Счетчики для /health
+        self.accepted = 0
+        self.processed = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @classmethod
+    def for_application(cls, application, loop, **kwargs):
+        """
+        Очередь для приложения python-telegram-bot: обновления обрабатываются
+        с учетом Application.concurrent_updates (через его update_processor)
+        """
+        def process(update):
+            return application.update_processor.process_update(update, application.process_update(update))
+        
+        return cls(process, loop, concurrent=application.concurrent_updates > 1, **kwargs)
+
+    def _remember(self, update_id):
+        """Запоминает update_id, вытесняя самые старые"""
+        self._seen[update_id] = None
+        if len(self._seen) > self.dedupe_size:
+            self._seen.popitem(last=False)
+
+    def submit(self, update_id, update):
+        """
+        Принимает обновление в очередь, не обращаясь к базе
+
+        Returns:
+            ACCEPTED, DUPLICATE (повторная доставка, отвечать 200)
+            или QUEUE_FULL (отвечать 429, Telegram повторит позже)
+            Повтор, который знает только база (принятый другим процессом),
+            отбрасывается позже, при обработке
+        """
+        with self._lock:
+            if update_id in self._seen:
+                self.duplicates += 1
+                return DUPLICATE
+            if self._depth >= self.max_depth:
+                self.dropped += 1
+                return QUEUE_FULL
+            self._depth += 1
+            self._remember(update_id)
+            self.accepted += 1
+
+        self.loop.call_soon_threadsafe(self._queue.put_nowait, update)
+        return ACCEPTED
+
+    async def run(self):
+        """
+        Обрабатывает обновления из очереди в порядке поступления:
+        по одному или, если concurrent, не дожидаясь окончания предыдущих
+        """
+        while True:
+            update = await self._queue.get()
+            if not self.concurrent:
+                await self._process(update)
+                continue
+            
+            task = asyncio.create_task(self._process(update))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, update):
+        """Обрабатывает одно обновление и обновляет счетчики"""
+        try:
+            if self.persist and not await adb.claim_update(update.update_id):
+                logger.info(f"🔁 Обновление {update.update_id} уже принято другим процессом, пропущено")
+                with self._lock:
+                    self.duplicates += 1
+                return
+            await self.process(update)
+            with self._lock:
+                self.processed += 1
+        except Exception as e:
+            with self._lock:
+                self.processed += 1
+                self.failed += 1
+            logger.error(f"❌ Ошибка обработки обновления {update.update_id}: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._depth -= 1
+
+    def stats(self):
+        """Глубина очереди и счетчики"""
+        with self._lock:
+            return {
+                'depth': self._depth,
+                'max_depth': self.max_depth,
+                'accepted': self.accepted,
+                'processed': self.processed,
+                'duplicates': self.duplicates,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
@@ -2,6 +2,7 @@
 keyboards.py - Все клавиатуры для бота дедлайнов
 """
 
+from datetime import datetime
 from telegram import (
     ReplyKeyboardMarkup,
     ReplyKeyboardRemove,
@@ -156,34 +157,62 @@ def get_confirm_complete_keyboard(deadline_id):
     ]
     return InlineKeyboardMarkup(keyboard)
 
-def get_deadlines_list_keyboard(deadlines, deadline_type="personal", page=0, page_size=5):
+# Формат момента дедлайна в курсоре страницы (callback_data не длиннее 64 байт)
+PAGE_CURSOR_FORMAT = "%Y%m%d%H%M%S%f"
+
+def get_page_callback(deadline_type, direction, deadline):
+    """
+    callback_data для перехода на соседнюю страницу списка
+    direction: "n" - следующая страница после deadline, "p" - предыдущая перед deadline
+    """
+    return f"page_{deadline_type}_{direction}_{deadline.deadline.strftime(PAGE_CURSOR_FORMAT)}_{deadline.id}"
+
+def parse_page_callback(data):
+    """
+    Разбирает callback_data перехода по страницам
+    Возвращает (deadline_type, direction, (deadline, id)) или (deadline_type, None, None)
+    для первой страницы (в том числе для кнопок старого формата)
+    """
+    parts = data.split("_")
+    deadline_type = parts[1]
+    if len(parts) != 5 or parts[2] not in ("n", "p"):
+        return deadline_type, None, None
+    
+    try:
+        cursor = (datetime.strptime(parts[3], PAGE_CURSOR_FORMAT), int(parts[4]))
+    except ValueError:
+        return deadline_type, None, None
+    return deadline_type, parts[2], cursor
+
+def get_deadlines_list_keyboard(page, deadline_type="personal"):
     """
     Клавиатура со списком дедлайнов для навигации
+    page - DeadlinePage (элементы страницы и наличие соседних страниц),
+    элементам нужны только id, subject, task_preview и deadline
     """
     keyboard = []
     
-    # Вычисляем индексы для текущей страницы
-    start_idx = page * page_size
-    end_idx = start_idx + page_size
-    current_deadlines = deadlines[start_idx:end_idx]
-    
     # Добавляем кнопки с дедлайнами
-    for deadline in current_deadlines:
+    for deadline in page.items:
         # Создаем текст кнопки (обрезаем, если слишком длинный)
-        button_text = f"{deadline.subject}: {deadline.task[:20]}..."
+        button_text = f"{deadline.subject}: {deadline.task_preview}..."
         if len(button_text) > 30:
             button_text = button_text[:27] + "..."
         
         callback_data = f"view_{deadline_type}_{deadline.id}"
         keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
     
-    # Добавляем кнопки навигации
+    # Добавляем кнопки навигации: курсор - крайний дедлайн текущей страницы
     nav_buttons = []
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"page_{deadline_type}_{page-1}"))
-    
-    if end_idx < len(deadlines):
-        nav_buttons.append(InlineKeyboardButton("Вперед ➡️", callback_data=f"page_{deadline_type}_{page+1}"))
+    if page.has_prev and page.items:
+        nav_buttons.append(InlineKeyboardButton(
+            "⬅️ Назад", callback_data=get_page_callback(deadline_type, "p", page.items[0])
+        ))
+    
+    if page.has_next and page.items:
+        nav_buttons.append(InlineKeyboardButton(
+            "Вперед ➡️", callback_data=get_page_callback(deadline_type, "n", page.items[-1])
+        ))
     
     if nav_buttons:
         keyboard.append(nav_buttons)
@@ -0,0 +1,180 @@
+"""
+log_tail.py - Чтение конца файла логов без загрузки всего файла
+
+Файл читается с конца блоками, поэтому память не зависит от размера логов.
+Запись лога - строка с временем и уровнем (формат logging.basicConfig в проекте)
+и следующие за ней строки без времени (например, traceback)
+"""
+
+import logging
+import os
+import re
+import time
+from datetime import datetime
+
+BLOCK_SIZE = 64 * 1024       # байт, читаемых за один шаг с конца файла
+MAX_LINE_BYTES = 16 * 1024   # длинные строки обрезаются
+MAX_RECORD_LINES = 200       # строк в одной записи (traceback), остальные отбрасываются
+MAX_TAIL_RECORDS = 1000      # больше записей за раз не отдается
+FOLLOW_POLL_INTERVAL = 1.0   # секунд между проверками новых строк
+FOLLOW_HEARTBEAT = 15.0      # секунд между пустыми событиями, чтобы соединение не закрылось
+FOLLOW_MAX_SECONDS = 300.0   # после этого поток завершается и освобождает worker, клиент переподключится
+
+# "2024-01-31 12:00:00,123 - main - ERROR - сообщение"
+RECORD_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})[,.]\d+ - .+? - ([A-Z]+) - ")
+
+def parse_level(level):
+    """Числовой уровень по имени ("ERROR") или числу, None - без фильтра"""
+    if level in (None, ""):
+        return None
+    if str(level).isdigit():
+        return int(level)
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Неизвестный уровень логов: {level}")
+    return value
+
+def parse_since(since):
+    """Время из ISO-строки ("2024-01-31T12:00" или "2024-01-31 12:00:00"), None - без фильтра"""
+    if not since:
+        return None
+    try:
+        return datetime.fromisoformat(since.replace("T", " "))
+    except ValueError:
+        raise ValueError(f"Неверное время: {since}, нужен формат ГГГГ-ММ-ДД ЧЧ:ММ")
+
+def parse_record_header(line):
+    """
+    Разбирает первую строку записи
+
+    Returns:
+        (время строкой "ГГГГ-ММ-ДД ЧЧ:ММ:СС", числовой уровень)
+        или None, если это продолжение предыдущей записи
+        Время строкой сравнивается с другим таким же без разбора даты
+    """
+    match = RECORD_PATTERN.match(line)
+    if not match:
+        return None
+    level = logging.getLevelName(match.group(2))
+    return match.group(1), level if isinstance(level, int) else logging.NOTSET
+
+def _decode(raw_line):
+    return raw_line[:MAX_LINE_BYTES].decode("utf-8", errors="replace").rstrip("\r")
+
+def _iter_lines_backwards(f, block_size=BLOCK_SIZE):
+    """Строки файла от последней к первой; в памяти не больше блока и одной строки"""
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    partial = b""
+
+    while position > 0:
+        read_size = min(block_size, position)
+        position -= read_size
+        f.seek(position)
+        chunk = f.read(read_size) + partial
+        lines = chunk.split(b"\n")
+
+        # Первая строка блока может начинаться в предыдущем блоке
+        partial = lines.pop(0)
+        if len(partial) > MAX_LINE_BYTES:
+            partial = partial[:MAX_LINE_BYTES]
+
+        for raw_line in reversed(lines):
+            yield _decode(raw_line)
+
+    if partial:
+        yield _decode(partial)
+
+def tail(path, count=100, level=None, since=None, block_size=BLOCK_SIZE):
+    """
+    Последние записи лога
+
+    Args:
+        path: путь к файлу логов
+        count: сколько записей вернуть (не больше MAX_TAIL_RECORDS)
+        level: минимальный уровень (например logging.ERROR), None - все
+        since: datetime, более ранние записи не возвращаются
+        block_size: размер блока чтения
+
+    Returns:
+        Список записей [(уровень, текст записи)] от старых к новым
+    """
+    count = max(1, min(count, MAX_TAIL_RECORDS))
+    since_text = since.strftime("%Y-%m-%d %H:%M:%S") if since else None
+    records = []
+    continuation = []  # строки без времени, прочитанные до своей первой строки
+
+    with open(path, "rb") as f:
+        for line in _iter_lines_backwards(f, block_size):
+            header = parse_record_header(line)
+            if header is None:
+                if line and len(continuation) < MAX_RECORD_LINES:
+                    continuation.append(line)
+                continue
+
+            timestamp, record_level = header
+            if since_text and timestamp < since_text:
+                # Записи идут по времени, дальше только более ранние
+                break
+
+            if level is None or record_level >= level:
+                records.append((record_level, "\n".join([line, *reversed(continuation)])))
+                if len(records) >= count:
+                    break
+            continuation = []
+
+    records.reverse()
+    return records
+
+def follow(path, level=None, poll_interval=FOLLOW_POLL_INTERVAL, heartbeat=FOLLOW_HEARTBEAT,
+           max_seconds=FOLLOW_MAX_SECONDS):
+    """
+    Новые строки лога по мере записи (как tail -f)
+    Продолжения записи (traceback) проходят фильтр вместе с ее первой строкой
+    Если файл пересоздан или обрезан (ротация), чтение начинается с его начала
+    Через max_seconds генератор завершается: каждый поток занимает worker веб-сервера
+
+    Yields:
+        (уровень, строка) или None раз в heartbeat секунд без новых строк
+    """
+    f = open(path, "rb")
+    try:
+        f.seek(0, os.SEEK_END)
+        record_level = logging.NOTSET
+        partial = b""
+        last_event = time.monotonic()
+        stop_at = last_event + max_seconds
+
+        while time.monotonic() < stop_at:
+            chunk = f.read(BLOCK_SIZE)
+            if not chunk:
+                try:
+                    rotated = (os.stat(path).st_ino != os.fstat(f.fileno()).st_ino
+                               or os.path.getsize(path) < f.tell())
+                except FileNotFoundError:
+                    rotated = False
+                if rotated:
+                    f.close()
+                    f = open(path, "rb")
+                    partial = b""
+                    continue
+
+                if time.monotonic() - last_event >= heartbeat:
+                    last_event = time.monotonic()
+                    yield None
+                time.sleep(min(poll_interval, max(stop_at - time.monotonic(), 0)))
+                continue
+
+            lines = (partial + chunk).split(b"\n")
+            partial = lines.pop()[:MAX_LINE_BYTES]
+
+            for raw_line in lines:
+                line = _decode(raw_line)
+                header = parse_record_header(line)
+                if header:
+                    record_level = header[1]
+                if level is None or record_level >= level:
+                    last_event = time.monotonic()
+                    yield record_level, line
+    finally:
+        f.close()
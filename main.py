@@ -25,7 +25,9 @@ from telegram.constants import ParseMode
 # Импортируем наши модули
 import config
 import database as db
+import async_database as adb
 import keyboards as kb
+import importer
 import reminders
 import asyncio
 import pytz
@@ -52,15 +54,28 @@ SET_GROUP = 9
 # Состояния для редактирования дедлайна
 EDIT_CHOICE, EDIT_VALUE = 10, 11
 
+# Часовой пояс для отображения дедлайнов
+MOSCOW_TZ = pytz.timezone(config.TIMEZONE)
+
 # ========== ФУНКЦИИ ДЛЯ ВЕБХУКОВ ==========
 
-def create_bot_application():
+def create_bot_application(concurrent_updates=1):
     """
     Создает и настраивает приложение бота
     Возвращает объект Application
+    
+    Args:
+        concurrent_updates: сколько обновлений обрабатывать одновременно
+                            (1 - строго по очереди, как при polling)
     """
     # Создаем приложение
-    application = Application.builder().token(config.BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(config.BOT_TOKEN)
+        .base_url(config.TELEGRAM_API_URL)
+        .concurrent_updates(concurrent_updates)
+        .build()
+    )
     
     # ========== РЕГИСТРАЦИЯ ОБРАБОТЧИКОВ ==========
     
@@ -161,6 +176,12 @@ def create_bot_application():
     )
     application.add_handler(group_deadline_conv_handler)
     
+    # Импорт групповых дедлайнов из файлов
+    application.add_handler(MessageHandler(
+        filters.Document.FileExtension("csv") | filters.Document.FileExtension("ics"),
+        handle_import_document
+    ))
+    
     # Обработчик кнопок главного меню
     application.add_handler(
         MessageHandler(filters.TEXT & ~filters.COMMAND, handle_main_menu)
@@ -268,7 +289,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         # Регистрируем пользователя в базе данных
-        db_user = db.get_or_create_user(
+        db_user = await adb.get_or_create_user(
             telegram_id=user.id,
             username=user.username,
             first_name=user.first_name,
@@ -335,6 +356,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • Видны всем участникам группы
 • Можно отмечать как "важные для всех"
 • Получаешь уведомления о дедлайнах твоей группы
+• Расписание можно загрузить файлом .csv (колонки: предмет, задание, дата, категория, важный) или .ics
 
 **⏰ Напоминания:**
 Я буду присылать напоминания:
@@ -393,11 +415,11 @@ async def debug_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Также получаем данные о пользователе и его дедлайнах
     user_id = update.effective_user.id
-    user = db.get_user_by_telegram_id(user_id)
+    user = await adb.get_user_by_telegram_id(user_id)
     
     # Получаем дедлайны для отладки
-    personal_deadlines = db.get_personal_deadlines(user_id)
-    group_deadlines = db.get_user_group_deadlines(user_id)
+    personal_deadlines = await adb.get_personal_deadlines(user_id)
+    group_deadlines = await adb.get_user_group_deadlines(user_id)
     
     # Формируем сообщение
     message = (
@@ -453,8 +475,8 @@ async def debug_reminders(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Получаем дедлайны пользователя
     user_id = update.effective_user.id
-    personal_deadlines = db.get_personal_deadlines(user_id)
-    group_deadlines = db.get_user_group_deadlines(user_id)
+    personal_deadlines = await adb.get_personal_deadlines(user_id)
+    group_deadlines = await adb.get_user_group_deadlines(user_id)
     
     message = f"🕰️ **Отладка напоминаний**\n\n"
     message += f"Текущее время (Москва): {now.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
@@ -535,7 +557,7 @@ async def create_test_deadline(update: Update, context: ContextTypes.DEFAULT_TYP
     # Создаем дедлайн на 16 минут вперед (для теста за час)
     test_time = datetime.now() + timedelta(minutes=16)
     
-    deadline_id = db.add_personal_deadline(
+    deadline_id = await adb.add_personal_deadline(
         user_id,
         "ТЕСТОВЫЙ ДЕДЛАЙН",
         "Проверка системы напоминаний",
@@ -572,7 +594,7 @@ async def setgroup_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Устанавливаем группу пользователя
     user_id = update.effective_user.id
-    if db.set_user_group(user_id, group_name):
+    if await adb.set_user_group(user_id, group_name):
         await update.message.reply_text(
             f"✅ Отлично! Теперь ты в группе *{group_name}*\n"
             f"Теперь ты будешь видеть все дедлайны этой группы.",
@@ -656,26 +678,26 @@ async def show_personal_deadlines_menu(update: Update, context: ContextTypes.DEF
     Показывает меню личных дедлайнов
     """
     user_id = update.effective_user.id
-    deadlines = db.get_personal_deadlines(user_id)
     
-    if deadlines:
-        # Группируем дедлайны по статусу
-        active = [d for d in deadlines if not d.is_completed]
-        completed = [d for d in deadlines if d.is_completed]
+    # Счетчики - одним GROUP BY, ближайшие - первая страница заголовков
+    counts = await adb.count_personal_deadlines(user_id)
+    
+    if counts['active'] or counts['completed']:
+        first_page = await adb.list_personal_deadline_headers(user_id)
         
         message = f"📋 **Твои личные дедлайны:**\n\n"
         message += f"📊 Статистика:\n"
-        message += f"• Активных: {len(active)}\n"
-        message += f"• Выполненных: {len(completed)}\n\n"
+        message += f"• Активных: {counts['active']}\n"
+        message += f"• Выполненных: {counts['completed']}\n\n"
         
-        if active:
+        if first_page.items:
             message += "⏳ **Ближайшие дедлайны:**\n"
-            for i, deadline in enumerate(active[:3], 1):
+            for i, deadline in enumerate(first_page.items[:3], 1):
                 time_left = calculate_time_left(deadline.deadline)
                 message += f"{i}. {deadline.subject} - {time_left}\n"
         
         # Создаем инлайн-клавиатуру для просмотра
-        keyboard = kb.get_deadlines_list_keyboard(active, "personal")
+        keyboard = kb.get_deadlines_list_keyboard(first_page, "personal")
         
         await update.message.reply_text(
             message,
@@ -694,25 +716,21 @@ async def show_group_deadlines_menu(update: Update, context: ContextTypes.DEFAUL
     Показывает меню групповых дедлайнов
     """
     user_id = update.effective_user.id
-    deadlines = db.get_user_group_deadlines(user_id)
-    
-    if deadlines:
-        # Группируем по категориям
-        categories = {}
-        for deadline in deadlines:
-            if deadline.category not in categories:
-                categories[deadline.category] = []
-            categories[deadline.category].append(deadline)
-        
+    
+    # Счетчики по категориям и первая страница заголовков, без текстов заданий
+    categories = await adb.count_group_deadlines_by_category(user_id)
+    
+    if categories:
         message = "👥 **Дедлайны твоей группы:**\n\n"
         
-        for category, cat_deadlines in categories.items():
-            message += f"📚 **{category}:** {len(cat_deadlines)}\n"
+        for category, count in categories:
+            message += f"📚 **{category}:** {count}\n"
         
         message += "\n👇 Выбери дедлайн для просмотра:"
         
         # Создаем инлайн-клавиатуру для просмотра
-        keyboard = kb.get_deadlines_list_keyboard(deadlines, "group")
+        first_page = await adb.list_group_deadline_headers(user_id)
+        keyboard = kb.get_deadlines_list_keyboard(first_page, "group")
         
         await update.message.reply_text(
             message,
@@ -720,7 +738,7 @@ async def show_group_deadlines_menu(update: Update, context: ContextTypes.DEFAUL
             reply_markup=keyboard
         )
     else:
-        user = db.get_user_by_telegram_id(user_id)
+        user = await adb.get_user_by_telegram_id(user_id)
         if user and user.group_name:
             await update.message.reply_text(
                 f"📭 В группе *{user.group_name}* пока нет дедлайнов.\n"
@@ -873,7 +891,7 @@ async def get_personal_priority(update: Update, context: ContextTypes.DEFAULT_TY
     
     # Сохраняем дедлайн в базу данных
     user_id = update.effective_user.id
-    deadline_id = db.add_personal_deadline(user_id, subject, task, deadline_date, priority)
+    deadline_id = await adb.add_personal_deadline(user_id, subject, task, deadline_date, priority)
     
     if deadline_id:
         formatted_date = deadline_date.strftime("%d.%m.%Y в %H:%M")
@@ -906,7 +924,7 @@ async def start_add_group_deadline(update: Update, context: ContextTypes.DEFAULT
     Начинает процесс добавления группового дедлайна
     """
     user_id = update.effective_user.id
-    user = db.get_user_by_telegram_id(user_id)
+    user = await adb.get_user_by_telegram_id(user_id)
     
     if not user or not user.group_name:
         await update.message.reply_text(
@@ -1068,7 +1086,7 @@ async def get_group_importance(update: Update, context: ContextTypes.DEFAULT_TYP
     
     # Получаем информацию о пользователе и группе
     user_id = update.effective_user.id
-    user = db.get_user_by_telegram_id(user_id)
+    user = await adb.get_user_by_telegram_id(user_id)
     
     if not user or not user.group_name:
         await update.message.reply_text(
@@ -1079,7 +1097,7 @@ async def get_group_importance(update: Update, context: ContextTypes.DEFAULT_TYP
         return ConversationHandler.END
     
     # Сохраняем дедлайн в базу данных
-    deadline_id = db.add_group_deadline(
+    deadline_id = await adb.add_group_deadline(
         user_id, subject, task, deadline_date, 
         user.group_name, category_key, is_important
     )
@@ -1118,6 +1136,67 @@ async def get_group_importance(update: Update, context: ContextTypes.DEFAULT_TYP
     
     return ConversationHandler.END
 
+# ========== ИМПОРТ ГРУППОВЫХ ДЕДЛАЙНОВ ==========
+
+async def handle_import_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Импортирует групповые дедлайны из присланного файла .csv или .ics
+    Файл сохраняется во временный файл и читается построчно,
+    прогресс показывается редактированием одного сообщения
+    """
+    import tempfile
+    
+    document = update.message.document
+    file_format = importer.detect_format(document.file_name)
+    user_id = update.effective_user.id
+    user = await adb.get_user_by_telegram_id(user_id)
+    
+    if not user or not user.group_name:
+        await update.message.reply_text(
+            "❌ Ты еще не в группе.\n"
+            "Сначала присоединись к группе через /setgroup",
+            reply_markup=kb.get_main_keyboard()
+        )
+        return
+    
+    if document.file_size and document.file_size > importer.MAX_IMPORT_FILE_SIZE:
+        await update.message.reply_text("❌ Файл слишком большой (максимум 20 МБ)")
+        return
+    
+    progress_message = await update.message.reply_text(
+        f"⏳ Импорт дедлайнов в группу {user.group_name}..."
+    )
+    loop = asyncio.get_running_loop()
+    pending_edits = []
+    
+    def report_progress(result):
+        # Вызывается из пула потоков базы
+        pending_edits.append(asyncio.run_coroutine_threadsafe(
+            progress_message.edit_text(result.format_progress()), loop
+        ))
+    
+    def run_import(path):
+        with open(path, "rb") as stream:
+            return importer.import_group_deadlines(
+                importer.open_text_stream(stream), file_format,
+                user_id, user.group_name, progress=report_progress
+            )
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"import.{file_format}")
+        try:
+            telegram_file = await document.get_file()
+            await telegram_file.download_to_drive(path)
+            result = await adb.run(run_import, path)
+        except Exception as e:
+            logger.error(f"❌ Ошибка импорта для {user_id}: {e}", exc_info=True)
+            await progress_message.edit_text("❌ Не удалось импортировать файл. Попробуй еще раз.")
+            return
+    
+    # Итог должен прийти после всех сообщений о прогрессе
+    await asyncio.gather(*map(asyncio.wrap_future, pending_edits), return_exceptions=True)
+    await progress_message.edit_text(result.format_summary())
+
 # ========== НАСТРОЙКА УВЕДОМЛЕНИЙ ==============
 
 async def show_notification_settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1125,7 +1204,7 @@ async def show_notification_settings(update: Update, context: ContextTypes.DEFAU
     Показывает настройки уведомлений
     """
     user_id = update.effective_user.id
-    user = db.get_user_by_telegram_id(user_id)
+    user = await adb.get_user_by_telegram_id(user_id)
     
     if not user:
         await update.message.reply_text("Пользователь не найден.")
@@ -1148,34 +1227,27 @@ async def handle_notification_settings(query, data, user_id):
     """
     Обработчик настроек уведомлений
     """
-    session = db.Session()
     try:
-        user = session.query(db.User).filter(db.User.telegram_id == user_id).first()
+        user = await adb.get_user_by_telegram_id(user_id)
         
         if not user:
             await query.answer("Пользователь не найден", show_alert=True)
             return
         
         if data == "toggle_week":
-            user.notify_week = not user.notify_week
-            session.commit()
+            user = await adb.set_user_notifications(user_id, notify_week=not user.notify_week)
             await query.answer(f"Напоминания за неделю: {'включены' if user.notify_week else 'выключены'}", show_alert=False)
         
         elif data == "toggle_day":
-            user.notify_day = not user.notify_day
-            session.commit()
+            user = await adb.set_user_notifications(user_id, notify_day=not user.notify_day)
             await query.answer(f"Напоминания за день: {'включены' if user.notify_day else 'выключены'}", show_alert=False)
         
         elif data == "enable_all":
-            user.notify_week = True
-            user.notify_day = True
-            session.commit()
+            user = await adb.set_user_notifications(user_id, notify_week=True, notify_day=True)
             await query.answer("Все напоминания включены!", show_alert=True)
         
         elif data == "disable_all":
-            user.notify_week = False
-            user.notify_day = False
-            session.commit()
+            user = await adb.set_user_notifications(user_id, notify_week=False, notify_day=False)
             await query.answer("Все напоминания выключены!", show_alert=True)
         
         elif data == "save_notifications":
@@ -1201,9 +1273,6 @@ async def handle_notification_settings(query, data, user_id):
     except Exception as e:
         logger.error(f"Ошибка при обработке настроек уведомлений: {e}")
         await query.answer("❌ Ошибка при сохранении настроек", show_alert=True)
-    
-    finally:
-        session.close()
 
 async def show_reminders_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -1236,8 +1305,8 @@ async def show_upcoming_deadlines(update: Update, context: ContextTypes.DEFAULT_
     user_id = update.effective_user.id
     
     # Получаем все дедлайны пользователя
-    personal_deadlines = db.get_personal_deadlines(user_id)
-    group_deadlines = db.get_user_group_deadlines(user_id)
+    personal_deadlines = await adb.get_personal_deadlines(user_id)
+    group_deadlines = await adb.get_user_group_deadlines(user_id)
     
     now = datetime.now()
     week_later = now + timedelta(days=7)
@@ -1297,15 +1366,9 @@ async def disable_reminders(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     user_id = update.effective_user.id
     
-    session = db.Session()
     try:
-        user = session.query(db.User).filter(db.User.telegram_id == user_id).first()
+        user = await adb.set_user_notifications(user_id, notify_week=False, notify_day=False)
         if user:
-            user.notify_week = False
-            user.notify_day = False
-            user.notify_hour = False
-            session.commit()
-            
             await update.message.reply_text(
                 "🔕 **Напоминания отключены**\n\n"
                 "Все автоматические напоминания временно отключены.\n"
@@ -1326,9 +1389,6 @@ async def disable_reminders(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "❌ Ошибка при отключении напоминаний.",
             reply_markup=kb.get_main_keyboard()
         )
-    
-    finally:
-        session.close()
 
 # ========== ОБРАБОТЧИКИ ИНЛАЙН-КНОПОК ==========
 
@@ -1392,9 +1452,9 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
             deadline_id = int(parts[3])
             
             if deadline_type == "personal":
-                success = db.delete_personal_deadline(deadline_id, user_id)
+                success = await adb.delete_personal_deadline(deadline_id, user_id)
             else:
-                success = db.delete_group_deadline(deadline_id, user_id)
+                success = await adb.delete_group_deadline(deadline_id, user_id)
             
             if success:
                 await query.edit_message_text(
@@ -1423,7 +1483,7 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
     elif data.startswith("confirm_complete_"):
         deadline_id = int(data.split("_")[2])
         
-        if db.mark_personal_deadline_completed(deadline_id, user_id):
+        if await adb.mark_personal_deadline_completed(deadline_id, user_id):
             await query.edit_message_text(
                 "✅ Задание отмечено как выполненное!",
                 reply_markup=None
@@ -1439,7 +1499,7 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
     elif data.startswith("subscribe_"):
         deadline_id = int(data.split("_")[1])
         
-        if db.subscribe_to_group_deadline(user_id, deadline_id):
+        if await adb.subscribe_to_group_deadline(user_id, deadline_id):
             await query.answer("✅ Ты подписан на уведомления об этом дедлайне!", show_alert=True)
         else:
             await query.answer("❌ Ты уже подписан на этот дедлайн!", show_alert=True)
@@ -1447,18 +1507,18 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
     
     # Пагинация
     elif data.startswith("page_"):
-        parts = data.split("_")
-        if len(parts) >= 3:
-            deadline_type = parts[1]
-            page = int(parts[2])
-            
-            if deadline_type == "personal":
-                deadlines = db.get_personal_deadlines(user_id)
-            else:
-                deadlines = db.get_user_group_deadlines(user_id)
-            
-            keyboard = kb.get_deadlines_list_keyboard(deadlines, deadline_type, page)
-            await query.edit_message_reply_markup(reply_markup=keyboard)
+        deadline_type, direction, cursor = kb.parse_page_callback(data)
+        after = cursor if direction == "n" else None
+        before = cursor if direction == "p" else None
+        
+        # Загружается только нужная страница
+        if deadline_type == "personal":
+            page = await adb.list_personal_deadline_headers(user_id, after=after, before=before)
+        else:
+            page = await adb.list_group_deadline_headers(user_id, after=after, before=before)
+        
+        keyboard = kb.get_deadlines_list_keyboard(page, deadline_type)
+        await query.edit_message_reply_markup(reply_markup=keyboard)
         return
     
     # Если не обработано ни одно условие
@@ -1470,48 +1530,26 @@ async def show_deadline_details(query, deadline_id, deadline_type):
     Показывает подробную информацию о дедлайне
     """
     if deadline_type == "personal":
-        # Получаем личный дедлайн
-        session = db.Session()
-        try:
-            deadline = session.query(db.Deadline).filter(db.Deadline.id == deadline_id).first()
-            if deadline:
-                message = format_deadline_message(deadline, "personal")
-                keyboard = kb.get_deadline_actions_keyboard(deadline_id, "personal")
-                
-                await query.edit_message_text(
-                    message,
-                    parse_mode=ParseMode.MARKDOWN,
-                    reply_markup=keyboard
-                )
-            else:
-                await query.edit_message_text(
-                    "❌ Дедлайн не найден.",
-                    reply_markup=None
-                )
-        finally:
-            session.close()
-    
+        deadline = await adb.get_personal_deadline(deadline_id)
     elif deadline_type == "group":
-        # Получаем групповой дедлайн
-        session = db.Session()
-        try:
-            deadline = session.query(db.GroupDeadline).filter(db.GroupDeadline.id == deadline_id).first()
-            if deadline:
-                message = format_deadline_message(deadline, "group")
-                keyboard = kb.get_deadline_actions_keyboard(deadline_id, "group")
-                
-                await query.edit_message_text(
-                    message,
-                    parse_mode=ParseMode.MARKDOWN,
-                    reply_markup=keyboard
-                )
-            else:
-                await query.edit_message_text(
-                    "❌ Дедлайн не найден.",
-                    reply_markup=None
-                )
-        finally:
-            session.close()
+        deadline = await adb.get_group_deadline(deadline_id)
+    else:
+        return
+    
+    if deadline:
+        message = format_deadline_message(deadline, deadline_type)
+        keyboard = kb.get_deadline_actions_keyboard(deadline_id, deadline_type)
+        
+        await query.edit_message_text(
+            message,
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=keyboard
+        )
+    else:
+        await query.edit_message_text(
+            "❌ Дедлайн не найден.",
+            reply_markup=None
+        )
 
 # ========== ОБРАБОТЧИК ОШИБОК ==========
 
@@ -1698,29 +1736,10 @@ def setup_webhook(webhook_url):
 
 async def setup_reminder_job(application):
     """
-    Настраивает периодическую задачу для проверки напоминаний
+    Настраивает таймеры напоминаний
+    Напоминания приходят точно за неделю и за день до дедлайна
     """
-    from reminders import DeadlineReminder
-    
-    reminder_manager = DeadlineReminder(application.bot)
-    
-    job_queue = application.job_queue
-    
-    async def check_reminders_job(context):
-        try:
-            logger.info("⏰ Запуск периодической проверки напоминаний...")
-            await reminder_manager.check_and_send_reminders()
-        except Exception as e:
-            logger.error(f"❌ Ошибка в задании проверки напоминаний: {e}")
-    
-    # Запускаем проверку каждые 6 часов (21600 секунд)
-    job_queue.run_repeating(
-        callback=check_reminders_job,
-        interval=21600,  # 6 часов
-        first=10         # Первый запуск через 10 секунд
-    )
-    
-    logger.info("✅ Планировщик напоминаний запущен (интервал: 6 часов)")
+    reminder_manager = await reminders.setup_reminder_job(application)
     return reminder_manager
 
 def test_reminder_function(user_id):
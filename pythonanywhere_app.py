@@ -5,10 +5,12 @@ pythonanywhere_app.py - Версия бота для PythonAnywhere с вебх
 import logging
 import os
 import sys
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 import asyncio
 import threading
 import time
+import socket
+from datetime import timedelta
 
 # Настройка пути для импортов
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -28,6 +30,22 @@ bot_application = None
 bot_thread = None
 reminder_manager = None
 
+# Планировщик напоминаний: один на все процессы веб-приложения
+SCHEDULER_LEASE_NAME = "reminder_scheduler"
+SCHEDULER_HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+SCHEDULER_INTERVAL = 600  # секунд между проверками напоминаний
+SCHEDULER_HEARTBEAT = 60  # секунд между продлениями аренды
+SCHEDULER_LEASE_TTL = timedelta(seconds=SCHEDULER_HEARTBEAT * 3)
+scheduler_is_leader = False
+
+# Цикл событий бота: один на процесс, работает в отдельном потоке (см. run_bot_loop)
+bot_loop = None
+bot_ready = threading.Event()  # приложение инициализировано и обрабатывает обновления
+update_ingestor = None         # очередь обновлений вебхука (см. ingestion.py)
+BOT_START_TIMEOUT = 30  # секунд, которые init_app ждет запуска бота
+BOT_INIT_RETRY = 30     # секунд между попытками инициализации
+BOT_CALL_TIMEOUT = 30   # секунд на вызов Bot API из обработчиков Flask
+
 def init_bot_application():
     """
     Инициализирует приложение бота
@@ -50,7 +68,7 @@ def init_bot_application():
     import reminders
     
     # Создаем приложение
-    application = Application.builder().token(config.BOT_TOKEN).build()
+    application = Application.builder().token(config.BOT_TOKEN).base_url(config.TELEGRAM_API_URL).build()
     
     # ========== ИМПОРТ ФУНКЦИЙ ИЗ MAIN.PY ==========
     from main import (
@@ -84,6 +102,9 @@ def init_bot_application():
         get_group_category,
         get_group_importance,
         
+        # Импорт групповых дедлайнов
+        handle_import_document,
+        
         # Группа
         setgroup_command,
         setgroup_input,
@@ -205,6 +226,12 @@ def init_bot_application():
     )
     application.add_handler(group_deadline_conv_handler)
     
+    # Импорт групповых дедлайнов из файлов
+    application.add_handler(MessageHandler(
+        filters.Document.FileExtension("csv") | filters.Document.FileExtension("ics"),
+        handle_import_document
+    ))
+    
     # Обработчик кнопок главного меню
     application.add_handler(
         MessageHandler(filters.TEXT & ~filters.COMMAND, handle_main_menu)
@@ -222,6 +249,9 @@ def init_bot_application():
 def init_reminders():
     """
     Инициализирует систему напоминаний
+    С JobQueue приложения напоминания приходят точно в срок (таймеры ставит
+    start_bot_application после запуска приложения), а проверка раз в
+    SCHEDULER_INTERVAL только досылает пропущенное
     """
     import reminders
     global bot_application
@@ -230,36 +260,139 @@ def init_reminders():
         logger.error("❌ Приложение бота не инициализировано")
         return None
     
-    reminder = reminders.DeadlineReminder(bot_application.bot)
+    reminder = reminders.DeadlineReminder(bot_application.bot, bot_application.job_queue)
     logger.info("✅ Менеджер напоминаний инициализирован")
     return reminder
 
-async def run_reminder_check():
+async def run_recorded_scan():
     """
-    Запускает проверку напоминаний
+    Одна проверка напоминаний с записью длительности и ошибки в журнал
+    (check_and_send_reminders сам логирует ошибку и пробрасывает ее сюда)
     """
-    global reminder_manager
+    import async_database as adb
+    from utils.time_utils import TimeManager
+    
+    started_at = TimeManager.now_utc().replace(tzinfo=None)
+    started = time.monotonic()
+    error = None
+    try:
+        await reminder_manager.check_and_send_reminders()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    
+    duration_ms = int((time.monotonic() - started) * 1000)
+    await adb.record_reminder_scan(SCHEDULER_HOLDER, started_at, duration_ms, error)
+    logger.info(f"⏱️ Проверка напоминаний заняла {duration_ms} мс")
+
+async def run_reminder_scheduler():
+    """
+    Планировщик напоминаний
+    Каждый процесс пытается взять аренду в базе, проверки делает только
+    ее держатель; если он пропадет, аренду через SCHEDULER_LEASE_TTL заберет другой
+    """
+    global scheduler_is_leader
     
     if not reminder_manager:
         logger.error("❌ Менеджер напоминаний не инициализирован")
         return
     
+    import database as db
+    import async_database as adb
+    
+    scan = None
+    next_scan = 0.0
     while True:
         try:
-            await reminder_manager.check_and_send_reminders()
-            # Ждем 1 час перед следующей проверкой
-            await asyncio.sleep(3600)
+            # Запись в базу - в пуле потоков, чтобы ожидание блокировки не останавливало цикл бота
+            is_leader = await adb.run(db.acquire_lease, SCHEDULER_LEASE_NAME, SCHEDULER_HOLDER, SCHEDULER_LEASE_TTL)
+            if is_leader != scheduler_is_leader:
+                logger.info(f"{'👑 Процесс стал планировщиком' if is_leader else '💤 Планировщик работает в другом процессе'} ({SCHEDULER_HOLDER})")
+                scheduler_is_leader = is_leader
+            
+            # Аренда продлевается и во время долгой проверки
+            if is_leader and (scan is None or scan.done()) and time.monotonic() >= next_scan:
+                scan = asyncio.create_task(run_recorded_scan())
+                next_scan = time.monotonic() + SCHEDULER_INTERVAL
         except Exception as e:
-            logger.error(f"❌ Ошибка в проверке напоминаний: {e}")
-            await asyncio.sleep(300)  # Ждем 5 минут при ошибке
+            logger.error(f"❌ Ошибка в планировщике напоминаний: {e}")
+        
+        await asyncio.sleep(SCHEDULER_HEARTBEAT)
 
-def run_reminders_in_thread():
+# ========== ЦИКЛ СОБЫТИЙ БОТА ==========
+
+async def start_bot_application():
     """
-    Запускает проверку напоминаний в отдельном потоке
+    Инициализирует и запускает приложение бота на его цикле событий
+    Если Telegram недоступен (initialize вызывает getMe), повторяет попытку
     """
+    if reminder_manager:
+        asyncio.create_task(run_reminder_scheduler())
+    
+    while True:
+        try:
+            await bot_application.initialize()
+            break
+        except Exception as e:
+            logger.error(f"❌ Не удалось инициализировать бота: {e}, повтор через {BOT_INIT_RETRY} сек")
+            await asyncio.sleep(BOT_INIT_RETRY)
+    
+    global update_ingestor
+    from ingestion import UpdateIngestor
+    
+    # start() запускает JobQueue, обновления вебхука идут через update_ingestor
+    await bot_application.start()
+    update_ingestor = UpdateIngestor.for_application(bot_application, asyncio.get_running_loop())
+    asyncio.create_task(update_ingestor.run())
+    
+    if reminder_manager:
+        await arm_reminder_timers()
+    
+    bot_ready.set()
+    logger.info("✅ Бот запущен в постоянном цикле событий")
+
+async def arm_reminder_timers():
+    """
+    Ставит таймеры на точное время напоминаний в JobQueue запущенного приложения
+    Таймеры ставит каждый процесс: повторная отправка исключена уникальностью
+    строк очереди напоминаний и журналом получателей групповых дедлайнов
+    """
+    import database as db
+    import async_database as adb
+    
+    # Таймеры переставляются при добавлении, удалении и выполнении дедлайнов
+    db.add_deadline_listener(reminder_manager.reschedule_deadlines)
+    try:
+        await adb.run(reminder_manager.schedule_all)
+    except Exception as e:
+        # Без таймеров напоминания все равно отправит проверка планировщика
+        logger.error(f"❌ Не удалось поставить таймеры напоминаний: {e}")
+    
+    # Досылаем напоминания, оставшиеся в очереди до перезапуска
+    reminder_manager._wake_outbox()
+
+def run_bot_loop():
+    """
+    Поток с постоянным циклом событий: ему принадлежат приложение бота,
+    его HTTP-клиент и планировщик напоминаний
+    """
+    global bot_loop
+    
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    loop.run_until_complete(run_reminder_check())
+    bot_loop = loop
+    loop.create_task(start_bot_application())
+    loop.run_forever()
+
+def run_on_bot_loop(coroutine, timeout=BOT_CALL_TIMEOUT):
+    """
+    Выполняет корутину (например, метод bot_application.bot) в цикле бота
+    и ждет результат - для синхронных обработчиков Flask
+    """
+    if not bot_ready.is_set():
+        coroutine.close()
+        raise RuntimeError("Бот еще не запущен")
+    
+    return asyncio.run_coroutine_threadsafe(coroutine, bot_loop).result(timeout)
 
 # ========== FLASK РОУТЫ ==========
 
@@ -433,20 +566,35 @@ def health_check():
     try:
         import database as db
         import config
+        from sqlalchemy import text
         
         # Проверяем базу данных
         session = db.Session()
-        session.execute("SELECT 1")
+        session.execute(text("SELECT 1"))
         session.close()
         
         # Проверяем бота
-        bot_status = "running" if bot_application else "not_running"
-        reminders_status = "running" if reminder_manager else "not_running"
+        if not bot_application:
+            bot_status = "not_running"
+        else:
+            bot_status = "running" if bot_ready.is_set() else "starting"
+        if not reminder_manager:
+            reminders_status = "not_running"
+        else:
+            reminders_status = "leader" if scheduler_is_leader else "standby"
+        last_scan = db.get_last_reminder_scan()
         
         return jsonify({
             'status': 'healthy',
             'bot': bot_status,
             'reminders': reminders_status,
+            'last_reminder_scan': {
+                'started_at': last_scan['started_at'].isoformat(),
+                'duration_ms': last_scan['duration_ms'],
+                'holder': last_scan['holder'],
+                'error': last_scan['error'],
+            } if last_scan else None,
+            'webhook_queue': update_ingestor.stats() if update_ingestor else None,
             'database': 'connected',
             'timestamp': time.time(),
             'server_time': time.strftime('%Y-%m-%d %H:%M:%S'),
@@ -464,18 +612,15 @@ def set_webhook():
     """Установка вебхука"""
     try:
         import config
-        from telegram import Bot
-        
-        bot = Bot(token=config.BOT_TOKEN)
         
         # Получаем URL вебхука из параметров или используем текущий
         webhook_url = request.args.get('url', f'https://{request.host}')
         
         # Устанавливаем вебхук
-        success = bot.set_webhook(
+        success = run_on_bot_loop(bot_application.bot.set_webhook(
             url=f"{webhook_url}/{config.BOT_TOKEN}",
             allowed_updates=["message", "callback_query", "chat_member", "my_chat_member"]
-        )
+        ))
         
         if success:
             logger.info(f"✅ Вебхук установлен на {webhook_url}/{config.BOT_TOKEN}")
@@ -501,11 +646,7 @@ def set_webhook():
 def remove_webhook():
     """Удаление вебхука"""
     try:
-        import config
-        from telegram import Bot
-        
-        bot = Bot(token=config.BOT_TOKEN)
-        success = bot.delete_webhook()
+        success = run_on_bot_loop(bot_application.bot.delete_webhook())
         
         if success:
             logger.info("✅ Вебхук удален")
@@ -530,11 +671,7 @@ def remove_webhook():
 def webhook_info():
     """Информация о вебхуке"""
     try:
-        import config
-        from telegram import Bot
-        
-        bot = Bot(token=config.BOT_TOKEN)
-        info = bot.get_webhook_info()
+        info = run_on_bot_loop(bot_application.bot.get_webhook_info())
         
         return jsonify({
             'status': 'success',
@@ -556,10 +693,16 @@ def webhook_info():
         }), 500
 
 @app.route(f'/<token>', methods=['POST'])
-async def webhook(token):
-    """Обработчик вебхуков"""
+def webhook(token):
+    """
+    Обработчик вебхуков
+    Обновление только ставится в очередь бота, обрабатывается оно
+    в цикле событий бота, поэтому Telegram получает ответ сразу
+    Повторная доставка получает 200 без обработки, при переполненной очереди - 429
+    """
     try:
         import config
+        import ingestion
         from telegram import Update
         
         # Проверяем токен
@@ -567,15 +710,24 @@ async def webhook(token):
             logger.warning(f"❌ Неверный токен вебхука: {token}")
             return jsonify({'status': 'error', 'message': 'Invalid token'}), 403
         
+        # Пока бот не запущен, Telegram повторит доставку позже
+        if not bot_ready.is_set():
+            return jsonify({'status': 'error', 'message': 'Bot is starting'}), 503
+        
         # Получаем обновление
         update_data = request.get_json()
         logger.debug(f"📥 Получено обновление: {update_data}")
         
-        # Создаем объект Update
+        # Создаем объект Update и ставим его в очередь
         update = Update.de_json(update_data, bot_application.bot)
+        result = update_ingestor.submit(update.update_id, update)
         
-        # Обрабатываем обновление
-        await bot_application.process_update(update)
+        if result == ingestion.QUEUE_FULL:
+            logger.warning(f"⚠️ Очередь вебхука переполнена, обновление {update.update_id} отклонено")
+            return jsonify({'status': 'error', 'message': 'Queue is full'}), 429, {'Retry-After': '1'}
+        if result == ingestion.DUPLICATE:
+            logger.info(f"🔁 Повторная доставка обновления {update.update_id} пропущена")
+            return jsonify({'status': 'duplicate'}), 200
         
         return jsonify({'status': 'success'}), 200
         
@@ -583,35 +735,59 @@ async def webhook(token):
         logger.error(f"❌ Ошибка обработки вебхука: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/import/<token>', methods=['POST'])
+def import_deadlines(token):
+    """
+    Импорт групповых дедлайнов из файла .csv или .ics
+
+    Форма multipart: file - файл, telegram_id - ID участника группы,
+    от имени которого добавляются дедлайны. Файл читается потоком,
+    дедлайны добавляются пакетами, прогресс пишется в лог
+    """
+    try:
+        import config
+        import database as db
+        import importer
+
+        if token != config.BOT_TOKEN:
+            logger.warning(f"❌ Неверный токен импорта: {token}")
+            return jsonify({'status': 'error', 'message': 'Invalid token'}), 403
+
+        upload = request.files.get('file')
+        file_format = importer.detect_format(upload.filename if upload else None)
+        if not file_format:
+            return jsonify({'status': 'error', 'message': 'Нужен файл .csv или .ics'}), 400
+
+        try:
+            telegram_id = int(request.form.get('telegram_id', ''))
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'Неверный telegram_id'}), 400
+
+        user = db.get_user_by_telegram_id(telegram_id)
+        if not user or not user.group_name:
+            return jsonify({'status': 'error', 'message': 'Пользователь не состоит в группе'}), 400
+
+        result = importer.import_group_deadlines(
+            importer.open_text_stream(upload.stream), file_format,
+            telegram_id, user.group_name,
+            progress=lambda result: logger.info(f"📥 {result.format_progress()}")
+        )
+
+        return jsonify({'status': 'success', 'group': user.group_name, **result.to_dict()})
+
+    except Exception as e:
+        logger.error(f"❌ Ошибка импорта: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/stats')
 def get_stats():
     """Получение статистики"""
     try:
         import database as db
         
-        session = db.Session()
-        
-        # Получаем количество пользователей
-        user_count = session.query(db.User).count()
-        
-        # Получаем количество активных дедлайнов
-        from datetime import datetime
-        deadline_count = session.query(db.Deadline).filter(
-            db.Deadline.is_completed == False,
-            db.Deadline.deadline >= datetime.now()
-        ).count()
-        
-        # Получаем количество уникальных групп
-        groups = session.query(db.User.group_name).distinct().all()
-        group_count = len([g for g in groups if g[0]])
-        
-        session.close()
-        
         return jsonify({
             'status': 'success',
-            'users': user_count,
-            'deadlines': deadline_count,
-            'groups': group_count,
+            **db.get_bot_stats(),
             'timestamp': time.time()
         })
         
@@ -809,77 +985,123 @@ def test_bot():
 
 @app.route('/logs')
 def show_logs():
-    """Показ логов"""
+    """
+    Показ логов: последние записи без чтения всего файла
+
+    Параметры запроса:
+        lines - сколько записей показать (по умолчанию 100)
+        level - минимальный уровень (INFO, WARNING, ERROR)
+        since - не раньше этого времени (ГГГГ-ММ-ДД ЧЧ:ММ)
+        follow=1 - поток новых строк в формате text/event-stream
+                   (завершается через log_tail.FOLLOW_MAX_SECONDS)
+    """
+    import html
+    import config
+    import log_tail
+
     try:
-        import io
-        import datetime
-        
-        # Читаем логи из файла или буфера
-        log_content = []
-        
-        # Пытаемся прочитать файл логов
-        log_file = 'bot.log'
-        if os.path.exists(log_file):
-            with open(log_file, 'r', encoding='utf-8') as f:
-                log_content = f.readlines()[-100:]  # Последние 100 строк
-        else:
-            # Или используем буфер логов
-            import logging
-            buffer = io.StringIO()
-            for handler in logging.getLogger().handlers:
-                if hasattr(handler, 'stream'):
-                    # Копируем логи из буфера
-                    pass
-        
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Логи бота</title>
-            <style>
-                body {{ font-family: monospace; margin: 20px; }}
-                .log {{ background: #f5f5f5; padding: 10px; border-radius: 5px; }}
-                .timestamp {{ color: #666; }}
-                .info {{ color: #007bff; }}
-                .error {{ color: #dc3545; }}
-                .warning {{ color: #ffc107; }}
-            </style>
-        </head>
-        <body>
-            <h2>📋 Логи бота (последние 100 строк)</h2>
-            <div class="log">
-                <pre>{''.join(log_content[-100:]) if log_content else 'Логи не найдены'}</pre>
-            </div>
-            <p><a href="/">← Назад</a></p>
-        </body>
-        </html>
-        """
-    except Exception as e:
-        return f"Ошибка при чтении логов: {e}"
+        lines = int(request.args.get('lines', 100))
+        level = log_tail.parse_level(request.args.get('level'))
+        since = log_tail.parse_since(request.args.get('since'))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    log_file = config.LOG_FILE
+    if not os.path.exists(log_file):
+        if request.args.get('follow'):
+            return jsonify({'status': 'error', 'message': 'Логи не найдены'}), 404
+        records = []
+    elif request.args.get('follow'):
+        def stream():
+            # stream_with_context выполняет генератор до первого yield еще в обработчике,
+            # поэтому первое событие отдается сразу, не дожидаясь новых строк
+            # Поток ограничен по времени (log_tail.FOLLOW_MAX_SECONDS), чтобы не занимать
+            # worker бесконечно; EventSource сам переподключается через retry мс
+            yield "retry: 1000\n: connected\n\n"
+            for event in log_tail.follow(log_file, level=level):
+                if event is None:
+                    yield ": ping\n\n"
+                else:
+                    yield f"data: {event[1]}\n\n"
+
+        return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    else:
+        try:
+            records = log_tail.tail(log_file, count=lines, level=level, since=since)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при чтении логов: {e}")
+            return f"Ошибка при чтении логов: {html.escape(str(e))}", 500
+
+    def css_class(record_level):
+        if record_level >= logging.ERROR:
+            return 'error'
+        if record_level >= logging.WARNING:
+            return 'warning'
+        return 'info'
+
+    log_html = "\n".join(
+        f'<span class="{css_class(record_level)}">{html.escape(text)}</span>'
+        for record_level, text in records
+    )
+    follow_url = f"/logs?follow=1&level={html.escape(request.args.get('level', ''))}"
+
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Логи бота</title>
+        <style>
+            body {{ font-family: monospace; margin: 20px; }}
+            .log {{ background: #f5f5f5; padding: 10px; border-radius: 5px; }}
+            .timestamp {{ color: #666; }}
+            .info {{ color: #007bff; }}
+            .error {{ color: #dc3545; }}
+            .warning {{ color: #ffc107; }}
+        </style>
+    </head>
+    <body>
+        <h2>📋 Логи бота (последние {len(records)} записей)</h2>
+        <p>
+            <a href="/logs?level=WARNING">Предупреждения</a> |
+            <a href="/logs?level=ERROR">Ошибки</a> |
+            <a href="/logs">Все</a> |
+            <a href="#" onclick="followLogs(); return false;">▶️ Следить</a>
+        </p>
+        <div class="log">
+            <pre id="log">{log_html or 'Логи не найдены'}</pre>
+        </div>
+        <p><a href="/">← Назад</a></p>
+        <script>
+            function followLogs() {{
+                const log = document.getElementById('log');
+                const source = new EventSource('{follow_url}');
+                source.onmessage = (event) => {{
+                    log.appendChild(document.createTextNode(event.data + '\\n'));
+                    window.scrollTo(0, document.body.scrollHeight);
+                }};
+            }}
+        </script>
+    </body>
+    </html>
+    """
 
 @app.route('/database')
 def database_info():
     """Информация о базе данных"""
     try:
+        import html
         import database as db
-        import sqlite3
-        
-        db_path = 'deadlines.db'
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        from sqlalchemy import inspect, text
         
-        # Получаем информацию о таблицах
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
+        # База та же, с которой работает бот (config.DATABASE_URL), а не файл в текущей папке
+        db_path = db.engine.url.database or str(db.engine.url)
         
         table_info = []
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-            count = cursor.fetchone()[0]
-            table_info.append((table_name, count))
-        
-        conn.close()
+        with db.engine.connect() as connection:
+            for table_name in inspect(connection).get_table_names():
+                count = connection.execute(text(f'SELECT COUNT(*) FROM "{table_name}"')).scalar()
+                table_info.append((table_name, count))
         
         return f"""
         <!DOCTYPE html>
@@ -896,7 +1118,7 @@ def database_info():
         </head>
         <body>
             <h2>🗄️ База данных бота</h2>
-            <p>Файл: {db_path}</p>
+            <p>Файл: {html.escape(db_path)}</p>
             
             <h3>Таблицы:</h3>
             <table>
@@ -921,6 +1143,10 @@ def init_app():
     """Инициализация приложения при запуске"""
     global bot_application, reminder_manager, bot_thread
     
+    # wsgi.py вызывает init_app еще раз после импорта модуля
+    if bot_application:
+        return True
+    
     try:
         logger.info("🚀 Инициализация бота для PythonAnywhere...")
         
@@ -930,36 +1156,26 @@ def init_app():
         # Инициализируем менеджер напоминаний
         reminder_manager = init_reminders()
         
-        # Запускаем напоминания в отдельном потоке
+        # Планировщик запускается в каждом процессе, но проверки
+        # делает только тот, у кого аренда (см. run_reminder_scheduler)
         if reminder_manager:
-            bot_thread = threading.Thread(target=run_reminders_in_thread, daemon=True)
-            bot_thread.start()
-            logger.info("✅ Поток напоминаний запущен")
-        
-        # Инициализируем планировщик задач в самом приложении бота
-        if bot_application and bot_application.job_queue:
-            # Создаем задачу для проверки напоминаний каждые 6 часов
-            from reminders import DeadlineReminder
-            
-            async def check_reminders(context):
-                if reminder_manager:
-                    await reminder_manager.check_and_send_reminders()
+            import database as db
             
-            bot_application.job_queue.run_repeating(
-                check_reminders,
-                interval=21600,  # 6 часов
-                first=30         # Первый запуск через 30 секунд
-            )
-            logger.info("✅ Планировщик задач инициализирован")
+            # Пропущенные групповые напоминания ставятся в очередь из любого процесса,
+            # отправит их ближайшая проверка
+            db.add_user_listener(reminder_manager.catch_up_user)
+        
+        # Бот и планировщик работают в одном постоянном цикле событий
+        bot_thread = threading.Thread(target=run_bot_loop, name="bot-loop", daemon=True)
+        bot_thread.start()
+        if not bot_ready.wait(BOT_START_TIMEOUT):
+            logger.warning("⚠️ Бот еще не запущен, вебхуки будут отклоняться до запуска")
         
         logger.info("✅ Бот успешно инициализирован для PythonAnywhere")
         
         # Автоматически устанавливаем вебхук
         try:
             import config
-            from telegram import Bot
-            
-            bot = Bot(token=config.BOT_TOKEN)
             
             # Получаем текущий хост
             current_host = f"https://{os.environ.get('PYTHONANYWHERE_SITE', '')}"
@@ -968,7 +1184,7 @@ def init_app():
                 current_host = "http://localhost:5000"
             
             webhook_url = f"{current_host}/{config.BOT_TOKEN}"
-            bot.set_webhook(webhook_url)
+            run_on_bot_loop(bot_application.bot.set_webhook(webhook_url))
             logger.info(f"✅ Вебхук автоматически установлен на {webhook_url}")
             
         except Exception as e:
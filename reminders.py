@@ -2,25 +2,56 @@
 reminders.py - Упрощенная система напоминаний
 """
 
+import asyncio
 import logging
 from datetime import timedelta
-from utils.time_utils import TimeManager
+from sqlalchemy import or_, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from telegram.error import BadRequest, NetworkError, RetryAfter
+from utils.time_utils import TimeManager, REMINDER_OFFSETS, REMINDER_GRACE
+from sender import MessageSender
 import database as db
+import async_database as adb
 
 logger = logging.getLogger(__name__)
 
+# Как называть срок напоминания в тексте сообщения
+TIME_UNITS = {
+    "week": "неделю",
+    "day": "день",
+}
+
+# Очередь отправки напоминаний
+OUTBOX_JOB_NAME = "reminder_outbox"
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE = timedelta(seconds=30)  # 30 с, 1 мин, 2 мин, 4 мин...
+OUTBOX_RETENTION = timedelta(days=30)  # сколько хранить отправленные, отмененные и неудачные
+
 class DeadlineReminder:
     """Класс для управления напоминаниями о дедлайнах"""
     
-    def __init__(self, bot):
+    def __init__(self, bot, job_queue=None):
         self.bot = bot
+        self.job_queue = job_queue
+        self.sender = MessageSender(bot)
+        self._draining = False
+        # Готовые тексты групповых напоминаний на текущую минуту
+        self._group_messages = {}
+        self._group_messages_minute = None
         logger.info("✅ Менеджер напоминаний инициализирован")
     
     async def check_and_send_reminders(self):
-        """Основная функция проверки и отправки напоминаний"""
+        """
+        Основная функция проверки и отправки напоминаний
+        Ошибка логируется и пробрасывается, чтобы вызывающий код записал ее в журнал проверок
+        """
         try:
             logger.info("🔔 Запуск проверки напоминаний...")
             
+            # 0. Досылаем то, что осталось в очереди с прошлого раза
+            await self.drain_outbox()
+            
             # 1. Проверяем личные дедлайны
             await self.check_personal_deadlines()
             
@@ -31,80 +62,623 @@ class DeadlineReminder:
             
         except Exception as e:
             logger.error(f"❌ Критическая ошибка в check_and_send_reminders: {e}", exc_info=True)
+            raise
     
     async def check_personal_deadlines(self):
         """Проверяет личные дедлайны и отправляет напоминания"""
+        await adb.run(self.enqueue_personal_reminders)
+        await self.drain_outbox()
+
+    async def check_group_deadlines(self):
+        """Проверяет групповые дедлайны и отправляет напоминания"""
+        await adb.run(self.enqueue_group_reminders)
+        await self.drain_outbox()
+
+    def enqueue_personal_reminders(self):
+        """Ставит в очередь наступившие напоминания о личных дедлайнах"""
         try:
             session = db.Session()
+            now_utc = TimeManager.now_utc().replace(tzinfo=None)
             
-            # Личные дедлайны, которые еще не выполнены
-            deadlines = session.query(db.Deadline).filter(
+            # Дедлайн уже прошел - напоминаний по нему больше не будет
+            session.query(db.Deadline).filter(
+                db.Deadline.next_reminder_at <= now_utc,
+                db.Deadline.deadline <= now_utc
+            ).update({db.Deadline.next_reminder_at: None}, synchronize_session=False)
+            
+            # Дедлайны с наступившим напоминанием вместе с настройками владельца
+            # одним запросом (индекс по next_reminder_at), строки читаются порциями.
+            # Дедлайны владельцев с выключенными напоминаниями тоже выбираются:
+            # напоминание отмечается обработанным и next_reminder_at сдвигается,
+            # иначе такие дедлайны читались бы в каждой проверке
+            rows = session.query(
+                db.Deadline,
+                db.User.telegram_id,
+                db.User.notify_week,
+                db.User.notify_day
+            ).join(
+                db.User, db.User.id == db.Deadline.user_id
+            ).filter(
+                db.Deadline.next_reminder_at <= now_utc,
                 db.Deadline.is_completed == False
-            ).all()
+            ).yield_per(100)
             
-            logger.info(f"🔍 Найдено {len(deadlines)} активных личных дедлайнов")
+            messages = []
+            processed = 0
+            for row in rows:
+                # row содержит telegram_id и notify_* владельца, как и объект User
+                messages.extend(self._plan_personal_reminder(row.Deadline, row, now_utc))
+                processed += 1
             
-            for deadline in deadlines:
-                user = session.query(db.User).filter(db.User.id == deadline.user_id).first()
-                if not user:
-                    continue
-                
-                # Используем TimeManager для проверки напоминаний
-                if TimeManager.is_in_reminder_window(deadline.deadline, "week"):
-                    if user.notify_week and not deadline.reminded_week:
-                        await self.send_personal_reminder(user.telegram_id, deadline, "неделю")
-                        deadline.reminded_week = True
-                        session.commit()
-                
-                elif TimeManager.is_in_reminder_window(deadline.deadline, "day"):
-                    if user.notify_day and not deadline.reminded_day:
-                        await self.send_personal_reminder(user.telegram_id, deadline, "день")
-                        deadline.reminded_day = True
-                        session.commit()
-                    
+            # Очередь и флаги сохраняются одной транзакцией
+            self._enqueue(session, "personal", messages, now_utc)
+            session.commit()
             session.close()
             
+            logger.info(f"🔍 Обработано {processed} личных дедлайнов с наступившим напоминанием")
+            
         except Exception as e:
             logger.error(f"Ошибка при проверке личных дедлайнов: {e}", exc_info=True)
+            raise
 
-    async def check_group_deadlines(self):
-        """Проверяет групповые дедлайны и отправляет напоминания"""
+    def enqueue_group_reminders(self):
+        """Ставит в очередь наступившие напоминания о групповых дедлайнах"""
         try:
             session = db.Session()
+            now_utc = TimeManager.now_utc().replace(tzinfo=None)
             
-            deadlines = session.query(db.GroupDeadline).all()
-            logger.info(f"Найдено {len(deadlines)} групповых дедлайнов")
+            # Только дедлайны, у которых наступил момент напоминания (индекс по next_reminder_at)
+            deadlines = session.query(db.GroupDeadline).filter(
+                db.GroupDeadline.next_reminder_at <= now_utc
+            ).all()
+            logger.info(f"Найдено {len(deadlines)} групповых дедлайнов с наступившим напоминанием")
+            
+            # Участники всех нужных групп - одним запросом на всю проверку
+            members = self._load_group_members(session, {deadline.group_name for deadline in deadlines})
             
+            candidates = []
             for deadline in deadlines:
-                users = session.query(db.User).filter(
-                    db.User.group_name == deadline.group_name
-                ).all()
+                candidates.extend(self._plan_group_reminder(
+                    deadline, members.get(deadline.group_name, []), now_utc
+                ))
+            
+            # Очередь, журнал получателей и флаги сохраняются одной транзакцией
+            messages = self._claim_group_recipients(session, candidates)
+            self._enqueue(session, "group", messages, now_utc)
+            session.commit()
+            session.close()
+            
+        except Exception as e:
+            logger.error(f"Ошибка при проверке групповых дедлайнов: {e}", exc_info=True)
+            raise
+
+    @staticmethod
+    def _load_group_members(session, group_names):
+        """
+        Загружает участников групп (индекс по users.group_name)
+        Возвращает словарь group_name -> [(id, telegram_id, notify_week, notify_day)]
+        """
+        members = {}
+        if not group_names:
+            return members
+        
+        rows = session.query(
+            db.User.group_name,
+            db.User.id,
+            db.User.telegram_id,
+            db.User.notify_week,
+            db.User.notify_day
+        ).filter(db.User.group_name.in_(group_names))
+        
+        for row in rows:
+            members.setdefault(row.group_name, []).append(row)
+        
+        return members
+
+    def _plan_personal_reminder(self, deadline, user, now_utc=None):
+        """
+        Определяет, какое напоминание о личном дедлайне пора отправить
+        user - любой объект с полями telegram_id, notify_week, notify_day
+        Отмечает напоминание флагом (сохраняет вызывающий код)
+        Возвращает список (chat_id, deadline, reminder_type) для отправки
+        """
+        messages = []
+        for reminder_type in REMINDER_OFFSETS:
+            flag_field = f"reminded_{reminder_type}"
+            if getattr(deadline, flag_field):
+                continue
+            
+            if TimeManager.is_reminder_due(deadline.deadline, reminder_type, now_utc):
+                if getattr(user, f"notify_{reminder_type}"):
+                    messages.append((user.telegram_id, deadline, reminder_type))
                 
-                if not users:
-                    continue
+                # Напоминание обработано, даже если пользователь его отключил
+                setattr(deadline, flag_field, True)
+                break
+        
+        # Сдвигаем next_reminder_at, иначе дедлайн попадет в каждую следующую проверку
+        deadline.update_next_reminder(now_utc)
+        return messages
+
+    def _plan_group_reminder(self, deadline, users, now_utc=None):
+        """
+        Определяет, какое напоминание о групповом дедлайне пора отправить всей группе
+        Отмечает напоминание флагом (сохраняет вызывающий код): флаг означает,
+        что рассылка по группе прошла, а кто именно ее получил - в журнале
+        Возвращает список (user_id, chat_id, deadline, reminder_type) для сверки с журналом
+        """
+        messages = []
+        # Проверяем каждое напоминание только один раз для дедлайна
+        for reminder_type in REMINDER_OFFSETS:
+            # Получаем соответствующее поле флага
+            flag_field = f"reminded_{reminder_type}"
+            if getattr(deadline, flag_field):
+                continue
+            
+            if TimeManager.is_reminder_due(deadline.deadline, reminder_type, now_utc):
+                # Напоминание получат все пользователи группы
+                for user in users:
+                    if getattr(user, f"notify_{reminder_type}"):
+                        messages.append((user.id, user.telegram_id, deadline, reminder_type))
                 
-                # Проверяем каждое напоминание только один раз для дедлайна
-                for reminder_type in ["week", "day"]:  # Убрали "hour"
-                    if TimeManager.is_in_reminder_window(deadline.deadline, reminder_type):
-                        # Получаем соответствующее поле флага
-                        flag_field = f"reminded_{reminder_type}"
-                        
-                        # Проверяем, не отправляли ли уже это напоминание
-                        if not getattr(deadline, flag_field):
-                            # Отправляем всем пользователям группы
-                            for user in users:
-                                if getattr(user, f"notify_{reminder_type}"):
-                                    await self.send_group_reminder(user.telegram_id, deadline, reminder_type)
-                            
-                            # Обновляем флаг
-                            setattr(deadline, flag_field, True)
-                            session.commit()
-                            break  # Переходим к следующему дедлайну
+                # Обновляем флаг
+                setattr(deadline, flag_field, True)
+                break  # Переходим к следующему дедлайну
+        
+        deadline.update_next_reminder(now_utc)
+        return messages
+
+    @staticmethod
+    def _current_group_reminder(deadline, now_utc):
+        """
+        Какое напоминание о групповом дедлайне сейчас актуально для досылки:
+        последнее уже разосланное, пока не наступило время следующего
+        Возвращает "week", "day" или None
+        """
+        current = None
+        for reminder_type in REMINDER_OFFSETS:
+            if TimeManager.reminder_time(deadline.deadline, reminder_type) <= now_utc:
+                current = reminder_type if getattr(deadline, f"reminded_{reminder_type}") else None
+        return current
+
+    def catch_up_user(self, telegram_id):
+        """
+        Досылает пользователю уже разосланные групповые напоминания,
+        которые до него не дошли: он вступил в группу позже рассылки
+        или включил напоминания после нее
+        Вызывается через add_user_listener
+        """
+        messages = []
+        session = db.Session()
+        try:
+            user = session.query(
+                db.User.id,
+                db.User.telegram_id,
+                db.User.group_name,
+                db.User.notify_week,
+                db.User.notify_day
+            ).filter(db.User.telegram_id == telegram_id).first()
+            if not user or not user.group_name:
+                return
+            
+            now_utc = TimeManager.now_utc().replace(tzinfo=None)
+            deadlines = session.query(db.GroupDeadline).filter(
+                db.GroupDeadline.group_name == user.group_name,
+                db.GroupDeadline.deadline > now_utc,
+                or_(db.GroupDeadline.reminded_week == True, db.GroupDeadline.reminded_day == True)
+            ).all()
+            
+            candidates = []
+            for deadline in deadlines:
+                reminder_type = self._current_group_reminder(deadline, now_utc)
+                if reminder_type and getattr(user, f"notify_{reminder_type}"):
+                    candidates.append((user.id, user.telegram_id, deadline, reminder_type))
             
+            messages = self._claim_group_recipients(session, candidates)
+            self._enqueue(session, "group", messages, now_utc)
+            session.commit()
+        finally:
             session.close()
+        
+        if messages:
+            logger.info(f"📬 Пользователю {telegram_id} досылается {len(messages)} групповых напоминаний")
+            self._wake_outbox()
+
+    # ========== ОЧЕРЕДЬ ОТПРАВКИ ==========
+
+    @staticmethod
+    def _claim_group_recipients(session, candidates):
+        """
+        Сверяет получателей групповых напоминаний с журналом и записывает
+        в него новых получателей в текущей транзакции
+        candidates: список (user_id, chat_id, deadline, reminder_type)
+        Возвращает список (chat_id, deadline, reminder_type) для тех, кому еще не напоминали
+        """
+        if not candidates:
+            return []
+        
+        # Журнал по всем нужным дедлайнам - одним запросом (по первичному ключу)
+        deadline_ids = {deadline.id for _, _, deadline, _ in candidates}
+        claimed = {
+            tuple(row) for row in session.query(
+                db.GroupReminderLedger.group_deadline_id,
+                db.GroupReminderLedger.reminder_type,
+                db.GroupReminderLedger.user_id
+            ).filter(db.GroupReminderLedger.group_deadline_id.in_(deadline_ids))
+        }
+        
+        fresh = [
+            (user_id, chat_id, deadline, reminder_type)
+            for user_id, chat_id, deadline, reminder_type in candidates
+            if (deadline.id, reminder_type, user_id) not in claimed
+        ]
+        if not fresh:
+            return []
+        
+        session.execute(
+            sqlite_insert(db.GroupReminderLedger).on_conflict_do_nothing(),
+            [
+                {
+                    'group_deadline_id': deadline.id,
+                    'reminder_type': reminder_type,
+                    'user_id': user_id,
+                }
+                for user_id, _, deadline, reminder_type in fresh
+            ]
+        )
+        return [(chat_id, deadline, reminder_type) for _, chat_id, deadline, reminder_type in fresh]
+
+    @staticmethod
+    def _enqueue(session, deadline_type, messages, now_utc):
+        """
+        Записывает напоминания в очередь в текущей транзакции
+        Повторная запись того же напоминания тому же получателю игнорируется
+        """
+        if not messages:
+            return
+        
+        session.execute(
+            sqlite_insert(db.ReminderOutbox).on_conflict_do_nothing(),
+            [
+                {
+                    'deadline_type': deadline_type,
+                    'deadline_id': deadline.id,
+                    'chat_id': chat_id,
+                    'reminder_type': reminder_type,
+                    'scheduled_at': TimeManager.reminder_time(deadline.deadline, reminder_type),
+                    'next_attempt_at': now_utc,
+                    'attempts': 0,
+                    'status': "pending",
+                }
+                for chat_id, deadline, reminder_type in messages
+            ]
+        )
+
+    async def drain_outbox(self):
+        """
+        Отправляет все напоминания из очереди, время которых пришло
+        Неудачные отправки повторяются с экспоненциальной задержкой
+        """
+        # Одна выборка очереди за раз, иначе строки уйдут дважды
+        if self._draining:
+            return
+        self._draining = True
+        
+        try:
+            while True:
+                entries, deadlines = await adb.run(self._load_outbox_batch)
+                if not entries:
+                    break
+                
+                # Отправляем параллельно в рамках лимитов Telegram,
+                # база во время отправки не блокируется
+                results = await asyncio.gather(*(
+                    self._deliver(entry, deadlines.get((entry.deadline_type, entry.deadline_id)))
+                    for entry in entries
+                ))
+                
+                # Результаты всей порции - одной транзакцией
+                await adb.run(self._mark_outbox_entries, entries, results)
             
+            self._schedule_outbox_retry(await adb.run(self._next_outbox_attempt))
+            await adb.run(self._purge_outbox)
+        
         except Exception as e:
-            logger.error(f"Ошибка при проверке групповых дедлайнов: {e}", exc_info=True)
+            logger.error(f"❌ Ошибка при отправке очереди напоминаний: {e}", exc_info=True)
+        
+        finally:
+            self._draining = False
+
+    def _load_outbox_batch(self):
+        """
+        Загружает порцию готовых к отправке напоминаний и их дедлайны
+        Возвращает (entries, {(deadline_type, deadline_id): deadline})
+        """
+        session = db.Session()
+        try:
+            now_utc = TimeManager.now_utc().replace(tzinfo=None)
+            entries = session.query(db.ReminderOutbox).filter(
+                db.ReminderOutbox.status == "pending",
+                db.ReminderOutbox.next_attempt_at <= now_utc
+            ).order_by(db.ReminderOutbox.next_attempt_at).limit(OUTBOX_BATCH_SIZE).all()
+            
+            deadlines = {}
+            for deadline_type, model in (("personal", db.Deadline), ("group", db.GroupDeadline)):
+                ids = {entry.deadline_id for entry in entries if entry.deadline_type == deadline_type}
+                if ids:
+                    for deadline in session.query(model).filter(model.id.in_(ids)):
+                        deadlines[(deadline_type, deadline.id)] = deadline
+            
+            return entries, deadlines
+        finally:
+            session.close()
+
+    async def _deliver(self, entry, deadline):
+        """
+        Отправляет одно напоминание из очереди
+        Возвращает результат: "sent", "cancelled", "retry" или "failed"
+        """
+        if deadline is None or (entry.deadline_type == "personal" and deadline.is_completed):
+            # Дедлайн удален или выполнен, пока напоминание ждало отправки
+            return "cancelled"
+        
+        if entry.deadline_type == "personal":
+            return await self.send_personal_reminder(entry.chat_id, deadline, TIME_UNITS[entry.reminder_type])
+        return await self.send_group_reminder(entry.chat_id, deadline, TIME_UNITS[entry.reminder_type])
+
+    @staticmethod
+    def _delivery_result(error):
+        """
+        Результат неудачной отправки для очереди: "retry" для временных ошибок
+        (лимит, таймаут, сеть), "failed" для остальных - бот заблокирован,
+        чат не найден, неверная разметка - повтор им не поможет
+        """
+        # BadRequest - подкласс NetworkError, но это постоянная ошибка
+        if isinstance(error, BadRequest):
+            return "failed"
+        if isinstance(error, (RetryAfter, NetworkError)):
+            return "retry"
+        return "failed"
+
+    @staticmethod
+    def _mark_outbox_entries(entries, results):
+        """
+        Сохраняет результаты отправки порции очереди одной транзакцией:
+        по одному UPDATE ... WHERE id IN (...) на каждый вид результата
+        """
+        now_utc = TimeManager.now_utc().replace(tzinfo=None)
+        
+        # (результат, attempts) -> id строк очереди
+        groups = {}
+        for entry, result in zip(entries, results):
+            attempts = entry.attempts + 1
+            if result == "retry" and attempts >= OUTBOX_MAX_ATTEMPTS:
+                result = "failed"
+                logger.error(f"❌ Напоминание {entry.id} не отправлено после {attempts} попыток")
+            elif result == "failed":
+                logger.error(f"❌ Напоминание {entry.id} не отправлено: ошибка не временная, без повторов")
+            key = (result, attempts if result == "retry" else None)
+            groups.setdefault(key, []).append(entry.id)
+        
+        session = db.Session()
+        try:
+            for (result, attempts), ids in groups.items():
+                if result == "sent":
+                    values = {
+                        'status': "sent",
+                        'attempts': db.ReminderOutbox.attempts + 1,
+                        'sent_at': now_utc,
+                    }
+                elif result == "cancelled":
+                    values = {'status': "cancelled"}
+                elif result == "failed":
+                    values = {'status': "failed", 'attempts': db.ReminderOutbox.attempts + 1}
+                else:
+                    values = {
+                        'attempts': attempts,
+                        'next_attempt_at': now_utc + OUTBOX_RETRY_BASE * 2 ** (attempts - 1),
+                    }
+                
+                session.query(db.ReminderOutbox).filter(
+                    db.ReminderOutbox.id.in_(ids)
+                ).update(values, synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+
+    @staticmethod
+    def _purge_outbox():
+        """
+        Удаляет из очереди завершенные строки старше OUTBOX_RETENTION
+        (индекс по status, next_attempt_at). Напоминания таких строк
+        относятся к уже прошедшим дедлайнам, поэтому повторно в очередь не попадут
+        """
+        session = db.Session()
+        try:
+            cutoff = TimeManager.now_utc().replace(tzinfo=None) - OUTBOX_RETENTION
+            deleted = session.query(db.ReminderOutbox).filter(
+                db.ReminderOutbox.status.in_(("sent", "cancelled", "failed")),
+                db.ReminderOutbox.next_attempt_at < cutoff
+            ).delete(synchronize_session=False)
+            session.commit()
+            if deleted:
+                logger.info(f"🧹 Удалено {deleted} старых строк очереди напоминаний")
+        finally:
+            session.close()
+
+    @staticmethod
+    def _next_outbox_attempt():
+        """Момент ближайшей попытки отправки из очереди (UTC) или None"""
+        session = db.Session()
+        try:
+            return session.query(func.min(db.ReminderOutbox.next_attempt_at)).filter(
+                db.ReminderOutbox.status == "pending"
+            ).scalar()
+        finally:
+            session.close()
+
+    def _schedule_outbox_retry(self, next_attempt_at):
+        """Ставит таймер на ближайшую повторную попытку отправки"""
+        if not self.job_queue:
+            # Без JobQueue очередь дошлет следующая проверка
+            return
+        
+        for job in self.job_queue.get_jobs_by_name(OUTBOX_JOB_NAME):
+            job.schedule_removal()
+        
+        if next_attempt_at:
+            now_utc = TimeManager.now_utc().replace(tzinfo=None)
+            self.job_queue.run_once(
+                self._outbox_job,
+                when=max((next_attempt_at - now_utc).total_seconds(), 0),
+                name=OUTBOX_JOB_NAME
+            )
+
+    def _wake_outbox(self):
+        """Запускает отправку очереди как можно скорее"""
+        if self.job_queue:
+            self.job_queue.run_once(self._outbox_job, when=0, name=OUTBOX_JOB_NAME)
+
+    async def _outbox_job(self, context):
+        """Срабатывание таймера очереди: досылает напоминания"""
+        await self.drain_outbox()
+
+    # ========== ТАЙМЕРЫ НАПОМИНАНИЙ ==========
+
+    @staticmethod
+    def _job_name(deadline_type, deadline_id, reminder_type):
+        """Имя задачи в JobQueue для конкретного напоминания"""
+        return f"reminder_{deadline_type}_{deadline_id}_{reminder_type}"
+
+    def schedule_all(self):
+        """
+        Ставит таймеры на все предстоящие напоминания
+        Вызывается один раз при запуске, дальше таймеры
+        переставляются через add_deadline_listener
+        """
+        if not self.job_queue:
+            logger.error("❌ JobQueue не передан, таймеры напоминаний не установлены")
+            return
+        
+        session = db.Session()
+        try:
+            now_utc = TimeManager.now_utc().replace(tzinfo=None)
+            
+            # Дедлайны без предстоящих напоминаний имеют next_reminder_at = NULL
+            personal = session.query(db.Deadline).filter(
+                db.Deadline.next_reminder_at != None
+            ).all()
+            group = session.query(db.GroupDeadline).filter(
+                db.GroupDeadline.next_reminder_at != None
+            ).all()
+            
+            for deadline in personal:
+                self._arm_deadline("personal", deadline, now_utc)
+            for deadline in group:
+                self._arm_deadline("group", deadline, now_utc)
+            
+            logger.info(f"⏰ Таймеры поставлены: {len(personal)} личных и {len(group)} групповых дедлайнов")
+        finally:
+            session.close()
+
+    def reschedule_deadlines(self, deadline_type, deadline_ids):
+        """
+        Переставляет таймеры дедлайнов после их изменения
+        Для удаленных и выполненных дедлайнов таймеры просто снимаются
+        Весь пакет (например, после массового импорта) читается одним запросом
+        Вызывается и из пула потоков базы (async_database): JobQueue потокобезопасен
+        """
+        if not self.job_queue:
+            return
+        
+        for deadline_id in deadline_ids:
+            self._cancel_deadline(deadline_type, deadline_id)
+        
+        model = db.Deadline if deadline_type == "personal" else db.GroupDeadline
+        session = db.Session()
+        try:
+            deadlines = session.query(model).filter(
+                model.id.in_(deadline_ids),
+                model.next_reminder_at != None
+            ).all()
+            
+            now_utc = TimeManager.now_utc().replace(tzinfo=None)
+            for deadline in deadlines:
+                if deadline_type == "personal" and deadline.is_completed:
+                    continue
+                self._arm_deadline(deadline_type, deadline, now_utc)
+        finally:
+            session.close()
+
+    def _cancel_deadline(self, deadline_type, deadline_id):
+        """Снимает все таймеры дедлайна"""
+        for reminder_type in REMINDER_OFFSETS:
+            for job in self.job_queue.get_jobs_by_name(self._job_name(deadline_type, deadline_id, reminder_type)):
+                job.schedule_removal()
+
+    def _arm_deadline(self, deadline_type, deadline, now_utc):
+        """Ставит по одному таймеру на каждое еще не отправленное напоминание"""
+        for reminder_type in REMINDER_OFFSETS:
+            if getattr(deadline, f"reminded_{reminder_type}"):
+                continue
+            
+            fire_at = TimeManager.reminder_time(deadline.deadline, reminder_type)
+            if fire_at + REMINDER_GRACE <= now_utc:
+                # Момент напоминания давно прошел - отправлять уже поздно
+                continue
+            
+            self.job_queue.run_once(
+                self._reminder_job,
+                when=max((fire_at - now_utc).total_seconds(), 0),
+                name=self._job_name(deadline_type, deadline.id, reminder_type),
+                data=(deadline_type, deadline.id, reminder_type)
+            )
+
+    async def _reminder_job(self, context):
+        """Срабатывание таймера: отправляет одно напоминание"""
+        deadline_type, deadline_id, reminder_type = context.job.data
+        
+        try:
+            await adb.run(self._enqueue_due_reminder, deadline_type, deadline_id, reminder_type)
+            await self.drain_outbox()
+        
+        except Exception as e:
+            logger.error(f"❌ Ошибка при отправке напоминания {deadline_type} {deadline_id}: {e}", exc_info=True)
+
+    def _enqueue_due_reminder(self, deadline_type, deadline_id, reminder_type):
+        """Ставит в очередь напоминание, на которое сработал таймер"""
+        session = db.Session()
+        try:
+            if deadline_type == "personal":
+                deadline = session.query(db.Deadline).filter(db.Deadline.id == deadline_id).first()
+                if not deadline or deadline.is_completed:
+                    return
+                users = session.query(db.User).filter(db.User.id == deadline.user_id).all()
+            else:
+                deadline = session.query(db.GroupDeadline).filter(db.GroupDeadline.id == deadline_id).first()
+                if not deadline:
+                    return
+                members = self._load_group_members(session, {deadline.group_name})
+                users = members.get(deadline.group_name, [])
+            
+            # Таймер может сработать на доли секунды раньше расчетного момента
+            fire_at = TimeManager.reminder_time(deadline.deadline, reminder_type)
+            now_utc = max(TimeManager.now_utc().replace(tzinfo=None), fire_at)
+            
+            if deadline_type == "personal":
+                if not users:
+                    return
+                messages = self._plan_personal_reminder(deadline, users[0], now_utc)
+            else:
+                messages = self._claim_group_recipients(
+                    session, self._plan_group_reminder(deadline, users, now_utc)
+                )
+            
+            # Очередь, журнал получателей и флаги сохраняются одной транзакцией
+            self._enqueue(session, deadline_type, messages, now_utc)
+            session.commit()
+        finally:
+            session.close()
 
     def _format_reminder_message(self, deadline, deadline_moscow, time_left, time_unit, is_personal):
         """Форматирует сообщение напоминания"""
@@ -148,7 +722,10 @@ class DeadlineReminder:
         return message
 
     async def send_personal_reminder(self, user_id, deadline, time_unit):
-        """Отправляет напоминание о личном дедлайне"""
+        """
+        Отправляет напоминание о личном дедлайне
+        Возвращает "sent", а при ошибке - "retry" или "failed" (см. _delivery_result)
+        """
         try:
             deadline_moscow = TimeManager.from_db_to_moscow(deadline.deadline)
             time_left = deadline_moscow - TimeManager.now()
@@ -157,37 +734,54 @@ class DeadlineReminder:
                 deadline, deadline_moscow, time_left, time_unit, is_personal=True
             )
             
-            await self.bot.send_message(
-                chat_id=user_id,
-                text=message,
-                parse_mode='Markdown'
-            )
+            await self.sender.send(user_id, message, parse_mode='Markdown')
             
             logger.info(f"✅ Отправлено напоминание пользователю {user_id} о дедлайне {deadline.id}")
+            return "sent"
             
         except Exception as e:
             logger.error(f"❌ Не удалось отправить напоминание пользователю {user_id}: {e}")
+            return self._delivery_result(e)
     
-    async def send_group_reminder(self, user_id, deadline, time_unit):
-        """Отправляет напоминание о групповом дедлайне"""
-        try:
+    def render_group_reminder(self, deadline, time_unit):
+        """
+        Возвращает текст группового напоминания, общий для всех получателей
+        Текст собирается один раз в минуту на дедлайн: точнее минуты
+        оставшееся время в сообщении все равно не показывается
+        """
+        now = TimeManager.now()
+        minute = now.replace(second=0, microsecond=0)
+        if minute != self._group_messages_minute:
+            self._group_messages = {}
+            self._group_messages_minute = minute
+        
+        key = (deadline.id, deadline.deadline, time_unit)
+        message = self._group_messages.get(key)
+        if message is None:
             deadline_moscow = TimeManager.from_db_to_moscow(deadline.deadline)
-            time_left = deadline_moscow - TimeManager.now()
-            
             message = self._format_reminder_message(
-                deadline, deadline_moscow, time_left, time_unit, is_personal=False
+                deadline, deadline_moscow, deadline_moscow - now, time_unit, is_personal=False
             )
+            self._group_messages[key] = message
+        
+        return message
+
+    async def send_group_reminder(self, user_id, deadline, time_unit):
+        """
+        Отправляет напоминание о групповом дедлайне
+        Возвращает "sent", а при ошибке - "retry" или "failed" (см. _delivery_result)
+        """
+        try:
+            message = self.render_group_reminder(deadline, time_unit)
             
-            await self.bot.send_message(
-                chat_id=user_id,
-                text=message,
-                parse_mode='Markdown'
-            )
+            await self.sender.send(user_id, message, parse_mode='Markdown')
             
             logger.info(f"✅ Отправлено групповое напоминание пользователю {user_id}")
+            return "sent"
             
         except Exception as e:
             logger.error(f"❌ Не удалось отправить групповое напоминание пользователю {user_id}: {e}")
+            return self._delivery_result(e)
 
     @staticmethod
     def format_time_left(time_left: timedelta) -> str:
@@ -210,21 +804,25 @@ class DeadlineReminder:
 
 async def setup_reminder_job(application):
     """
-    Настраивает периодическую задачу для проверки напоминаний
+    Настраивает таймеры напоминаний
     Возвращает экземпляр DeadlineReminder
     """
     # Создаем экземпляр менеджера напоминаний
-    reminder = DeadlineReminder(application.bot)
+    reminder = DeadlineReminder(application.bot, application.job_queue)
+    
+    # Таймеры переставляются при добавлении, удалении и выполнении дедлайнов
+    db.add_deadline_listener(reminder.reschedule_deadlines)
     
-    # Запускаем задачу каждые 6 часов (21600 секунд)
-    job_queue = application.job_queue
-    job_queue.run_repeating(
-        callback=reminder.check_and_send_reminders,
-        interval=21600,  # 6 часов в секундах
-        first=10         # Первый запуск через 10 секунд
-    )
+    # Вступившим в группу позже и включившим напоминания досылаем пропущенное
+    db.add_user_listener(reminder.catch_up_user)
     
-    logger.info("✅ Планировщик напоминаний запущен (интервал: 6 часов)")
+    # Ставим таймеры на точное время каждого напоминания
+    reminder.schedule_all()
+    
+    # Досылаем напоминания, оставшиеся в очереди до перезапуска
+    application.job_queue.run_once(reminder._outbox_job, when=0, name=OUTBOX_JOB_NAME)
+    
+    logger.info("✅ Планировщик напоминаний запущен (таймеры на точное время)")
     
     return reminder
 
@@ -279,5 +877,106 @@ def test_reminder_logic():
     print("✅ Тестирование завершено!")
     print("=" * 60)
 
+def test_personal_scan_query_count():
+    """
+    Проверяет, что проверка личных дедлайнов делает одинаковое
+    число SQL-запросов независимо от количества дедлайнов
+    (на временной базе, рабочая база не затрагивается)
+    """
+    import os
+    import tempfile
+    from sqlalchemy import event
+    from sqlalchemy.orm import sessionmaker
+    
+    print("🧪 Тестирование числа запросов при проверке личных дедлайнов")
+    print("=" * 60)
+    
+    class SilentBot:
+        """Бот-заглушка, ничего не отправляет"""
+        async def send_message(self, chat_id, text, parse_mode=None):
+            pass
+    
+    directory = tempfile.mkdtemp()
+    test_engine = db.create_db_engine(f"sqlite:///{os.path.join(directory, 'scan_test.db')}")
+    db.Base.metadata.create_all(test_engine)
+    
+    # Все функции database.py и сама проверка работают через db.Session;
+    # кэш users.id общий для модуля, поэтому сбрасывается при смене базы
+    production_session = db.Session
+    db.Session = sessionmaker(bind=test_engine)
+    db.user_id_cache.clear()
+    
+    statements = []
+    
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    try:
+        telegram_id = 333333
+        db.get_or_create_user(telegram_id, "scan_test", "Тест", "Проверки")
+        reminder = DeadlineReminder(SilentBot())
+        
+        counts = {}
+        for deadlines_count in (1, 25):
+            # Все дедлайны - с наступившим напоминанием "за день"
+            deadline_time = TimeManager.now() + timedelta(days=1, minutes=-5)
+            ids = [
+                db.add_personal_deadline(telegram_id, "Тест", f"Задание {i}", deadline_time)
+                for i in range(deadlines_count)
+            ]
+            
+            statements.clear()
+            event.listen(test_engine, "before_cursor_execute", count_statement)
+            try:
+                reminder.enqueue_personal_reminders()
+            finally:
+                event.remove(test_engine, "before_cursor_execute", count_statement)
+            counts[deadlines_count] = len(statements)
+            
+            for deadline_id in ids:
+                db.delete_personal_deadline(deadline_id, telegram_id)
+            
+            print(f"Дедлайнов: {deadlines_count}, SQL-запросов: {counts[deadlines_count]}")
+        
+        assert counts[1] == counts[25], f"Число запросов зависит от числа дедлайнов: {counts}"
+        
+        # Одна проверка на двух владельцах: с включенными напоминаниями
+        # и с выключенными обоими - второй не получает строк очереди,
+        # но его дедлайн выходит из проверки
+        silent_telegram_id = 444444
+        db.get_or_create_user(silent_telegram_id, "scan_test_silent", "Тест", "Без напоминаний")
+        db.set_user_notifications(silent_telegram_id, notify_week=False, notify_day=False)
+        
+        deadline_time = TimeManager.now() + timedelta(days=1, minutes=-5)
+        notified_id = db.add_personal_deadline(telegram_id, "Тест", "С напоминанием", deadline_time)
+        silent_id = db.add_personal_deadline(silent_telegram_id, "Тест", "Без напоминаний", deadline_time)
+        reminder.enqueue_personal_reminders()
+        
+        session = db.Session()
+        try:
+            outbox = session.query(db.ReminderOutbox.deadline_id, db.ReminderOutbox.chat_id).filter(
+                db.ReminderOutbox.deadline_id.in_((notified_id, silent_id))
+            ).all()
+            assert outbox == [(notified_id, telegram_id)], f"Неверная очередь напоминаний: {outbox}"
+            
+            silent = session.get(db.Deadline, silent_id)
+            assert silent.reminded_day, "Напоминание не отмечено обработанным"
+            now_utc = TimeManager.now_utc().replace(tzinfo=None)
+            assert silent.next_reminder_at is None or silent.next_reminder_at > now_utc, \
+                "next_reminder_at не сдвинут для пользователя с выключенными напоминаниями"
+        finally:
+            session.close()
+        print("Выключенные напоминания: дедлайн выведен из проверки без отправки")
+    
+    finally:
+        db.Session = production_session
+        db.user_id_cache.clear()
+        test_engine.dispose()
+    
+    print("=" * 60)
+    print("✅ Число запросов не зависит от количества дедлайнов!")
+    print("=" * 60)
+
 if __name__ == "__main__":
     test_reminder_logic()
+    test_personal_scan_query_count()
@@ -0,0 +1,109 @@
+"""
+sender.py - Отправка сообщений с учетом лимитов Telegram
+"""
+
+import asyncio
+import logging
+import time
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram Bot API
+GLOBAL_RATE = 30          # сообщений в секунду на бота
+PER_CHAT_INTERVAL = 1.0   # секунд между сообщениями в один чат
+MAX_CONCURRENCY = 10      # одновременных запросов к API
+MAX_RETRIES = 3           # попыток после RetryAfter
+
+class TokenBucket:
+    """
+    Корзина токенов: не больше rate операций в секунду
+    с возможностью временно остановить выдачу (после RetryAfter)
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        """Добавляет токены за прошедшее время"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Ждет, пока появится свободный токен, и забирает его"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Останавливает выдачу токенов на указанное время"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self._updated = self._paused_until
+
+class MessageSender:
+    """
+    Отправляет сообщения параллельно, но в рамках лимитов Telegram:
+    общий лимит на бота, лимит на один чат и ограничение числа одновременных запросов
+    """
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE, per_chat_interval=PER_CHAT_INTERVAL,
+                 max_concurrency=MAX_CONCURRENCY):
+        self.bot = bot
+        self.per_chat_interval = per_chat_interval
+        self._bucket = TokenBucket(global_rate)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._chat_next = {}  # chat_id -> когда можно писать в чат в следующий раз
+
+    async def _wait_for_chat(self, chat_id):
+        """Резервирует ближайший свободный момент для отправки в чат"""
+        now = time.monotonic()
+        slot = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = slot + self.per_chat_interval
+
+        # Не даем словарю расти бесконечно
+        if len(self._chat_next) > 10000:
+            self._chat_next = {
+                chat: next_at for chat, next_at in self._chat_next.items() if next_at > now
+            }
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def send(self, chat_id, text, parse_mode=None):
+        """
+        Отправляет одно сообщение с учетом лимитов
+        При RetryAfter останавливает общую корзину и повторяет попытку,
+        остальные ошибки пробрасываются вызывающему коду
+        """
+        await self._wait_for_chat(chat_id)
+
+        for attempt in range(MAX_RETRIES + 1):
+            await self._bucket.acquire()
+            try:
+                async with self._semaphore:
+                    return await self.bot.send_message(
+                        chat_id=chat_id,
+                        text=text,
+                        parse_mode=parse_mode
+                    )
+            except RetryAfter as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                logger.warning(f"⏳ Лимит Telegram, пауза {e.retry_after} сек (чат {chat_id})")
+                self._bucket.pause(e.retry_after)
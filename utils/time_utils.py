@@ -13,6 +13,16 @@ logger = logging.getLogger(__name__)
 MOSCOW_TZ = pytz.timezone('Europe/Moscow')
 UTC_TZ = pytz.UTC
 
+# За сколько до дедлайна отправляется каждое напоминание
+REMINDER_OFFSETS = {
+    "week": timedelta(days=7),
+    "day": timedelta(days=1),
+}
+
+# Сколько времени после расчетного момента напоминание еще можно отправить
+# (например, если бот был перезапущен и пропустил таймер)
+REMINDER_GRACE = timedelta(hours=6)
+
 class TimeManager:
     """Класс для управления временем и часовыми поясами"""
     
@@ -27,13 +37,22 @@ class TimeManager:
         return datetime.now(UTC_TZ)
     
     @staticmethod
-    def parse_user_input(date_str: str, time_str: str = "23:59") -> datetime:
+    def now_for_db() -> datetime:
+        """
+        Текущее время в формате колонок дедлайнов в БД (UTC, наивный, см. to_utc_for_db)
+        для сравнения с ними в запросах
+        """
+        return datetime.now(UTC_TZ).replace(tzinfo=None)
+    
+    @staticmethod
+    def parse_user_input(date_str: str, time_str: str = "23:59", log_errors: bool = True) -> datetime:
         """
         Парсит ввод пользователя в московское время
         
         Args:
             date_str: Дата в формате "YYYY-MM-DD" или "DD.MM.YYYY"
             time_str: Время в формате "HH:MM" (по умолчанию 23:59)
+            log_errors: логировать ошибку разбора (импорт собирает ошибки сам)
         
         Returns:
             datetime в московском часовом поясе
@@ -59,9 +78,42 @@ class TimeManager:
             return MOSCOW_TZ.localize(naive_dt)
             
         except Exception as e:
-            logger.error(f"Ошибка парсинга времени: {e}")
+            if log_errors:
+                logger.error(f"Ошибка парсинга времени: {e}")
             raise ValueError(f"Неверный формат времени. Используйте: ГГГГ-ММ-ДД ЧЧ:ММ")
     
+    @staticmethod
+    def parse_ical_datetime(value: str, tzid: Optional[str] = None) -> datetime:
+        """
+        Парсит дату из iCalendar (DTSTART, DUE) в московское время
+
+        Args:
+            value: "YYYYMMDD" (весь день, как и в ручном вводе - до 23:59),
+                   "YYYYMMDDTHHMMSSZ" (UTC) или "YYYYMMDDTHHMMSS" (местное время)
+            tzid: часовой пояс местного времени (параметр TZID),
+                  без него время считается московским
+
+        Returns:
+            datetime в московском часовом поясе
+        """
+        value = value.strip()
+        try:
+            if len(value) == 8:
+                naive_dt = datetime.combine(datetime.strptime(value, "%Y%m%d").date(),
+                                            datetime.strptime("23:59", "%H:%M").time())
+                return MOSCOW_TZ.localize(naive_dt)
+
+            if value.endswith("Z"):
+                utc_dt = UTC_TZ.localize(datetime.strptime(value[:-1], "%Y%m%dT%H%M%S"))
+                return utc_dt.astimezone(MOSCOW_TZ)
+
+            naive_dt = datetime.strptime(value, "%Y%m%dT%H%M%S")
+            tz = pytz.timezone(tzid) if tzid else MOSCOW_TZ
+            return tz.localize(naive_dt).astimezone(MOSCOW_TZ)
+
+        except (ValueError, pytz.UnknownTimeZoneError):
+            raise ValueError(f"Неверная дата iCalendar: {value}" + (f" ({tzid})" if tzid else ""))
+
     @staticmethod
     def to_utc_for_db(moscow_dt: datetime) -> datetime:
         """
@@ -145,25 +197,57 @@ class TimeManager:
             return f"{minutes} минут"
     
     @staticmethod
-    def is_in_reminder_window(deadline_db, reminder_type):
+    def reminder_time(deadline_db: datetime, reminder_type: str) -> datetime:
         """
-        Проверяет, находится ли дедлайн в окне для напоминания
+        Вычисляет точный момент отправки напоминания
+        
+        Args:
+            deadline_db: datetime из базы данных (в UTC)
+            reminder_type: "week" или "day"
+        
+        Returns:
+            Наивный datetime в UTC
+        """
+        return deadline_db - REMINDER_OFFSETS[reminder_type]
+    
+    @staticmethod
+    def is_reminder_due(deadline_db: datetime, reminder_type: str, now_utc: Optional[datetime] = None) -> bool:
+        """
+        Проверяет, наступил ли момент напоминания и не устарело ли оно
         deadline_db: datetime из базы данных (в UTC)
         reminder_type: "week" или "day"
+        now_utc: текущее время в UTC (наивное), по умолчанию - сейчас
         """
-        deadline_moscow = TimeManager.from_db_to_moscow(deadline_db)
-        now = TimeManager.now()
-        time_left = deadline_moscow - now
-        
-        if reminder_type == "week":
-            # Проверка за неделю (7 дней ± 6 часов, т.к. проверка каждые 6 часов)
-            target = timedelta(days=7)
-            window = timedelta(hours=6)  # Увеличили окно для проверки каждые 6 часов
-            return (target - window) <= time_left <= (target + window)
-        elif reminder_type == "day":
-            # Проверка за день (1 день ± 6 часов)
-            target = timedelta(days=1)
-            window = timedelta(hours=6)
-            return (target - window) <= time_left <= (target + window)
-        
-        return False
\ No newline at end of file
+        if now_utc is None:
+            now_utc = TimeManager.now_utc().replace(tzinfo=None)
+        
+        fire_at = TimeManager.reminder_time(deadline_db, reminder_type)
+        return fire_at <= now_utc < fire_at + REMINDER_GRACE
+    
+    @staticmethod
+    def next_reminder_at(deadline_db: datetime, reminded_week: bool = False, reminded_day: bool = False,
+                         now_utc: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        Вычисляет момент ближайшего неотправленного напоминания
+        
+        Args:
+            deadline_db: datetime из базы данных (в UTC)
+            reminded_week: напоминание за неделю уже отправлено
+            reminded_day: напоминание за день уже отправлено
+            now_utc: текущее время в UTC (наивное), по умолчанию - сейчас
+        
+        Returns:
+            Наивный datetime в UTC или None, если напоминаний больше не будет
+        """
+        if now_utc is None:
+            now_utc = TimeManager.now_utc().replace(tzinfo=None)
+        
+        for reminder_type, reminded in (("week", reminded_week), ("day", reminded_day)):
+            if reminded:
+                continue
+            
+            fire_at = TimeManager.reminder_time(deadline_db, reminder_type)
+            if fire_at + REMINDER_GRACE > now_utc:
+                return fire_at
+        
+        return None